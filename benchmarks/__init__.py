@@ -0,0 +1,5 @@
+"""Offline benchmarks: a fake LLM, a hash embedder and synthetic history, no network or model downloads.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios retrieval --sizes 1000 10000 --out before.json
+"""
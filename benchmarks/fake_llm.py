@@ -0,0 +1,54 @@
+from __future__ import annotations
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+# the metacognition prompt (src/utils/prompting.py) and where the user message sits in it
+META_MARKER = "meta-cognitive controller"
+META_USER = re.compile(r"^User: (.*)$", re.MULTILINE)
+
+WORDS = ("the", "plan", "meeting", "notes", "follow", "up", "tomorrow", "project", "review", "summary",
+         "ongoing", "resolved", "task", "call", "draft", "update", "budget", "trip", "doctor", "release")
+
+
+class FakeLLM:
+    """Deterministic offline `LLMInterface`.
+
+    Every call sleeps `latency` seconds (time to first token) plus
+    `per_token` per output word, and returns `words` words chosen from a hash
+    of the prompt, so equal prompts get equal replies. Metacognition prompts
+    get a "semantic" decision on the user message, which exercises retrieval.
+    """
+
+    def __init__(self, latency: float = 0.0, words: int = 64, per_token: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.words = words
+        self.per_token = per_token
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, prompt: str, options: Optional[Dict[str, Any]]) -> str:
+        with self._lock:
+            self.calls += 1
+        if META_MARKER in prompt:
+            m = META_USER.search(prompt)
+            return json.dumps({"strategy": "semantic", "params": {"query": m.group(1) if m else prompt[-200:]}})
+        system = (options or {}).get("system") or ""
+        digest = hashlib.blake2b(f"{self.seed}\0{system}\0{prompt}".encode(), digest_size=32).digest()
+        return " ".join(WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(self.words))
+
+    def generate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        text = self._reply(prompt, options)
+        time.sleep(self.latency + self.per_token * self.words)
+        return text
+
+    def stream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        text = self._reply(prompt, options)
+        time.sleep(self.latency)
+        for i, word in enumerate(text.split(" ")):
+            time.sleep(self.per_token)
+            yield word if i == 0 else " " + word
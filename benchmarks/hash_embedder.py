@@ -0,0 +1,56 @@
+from __future__ import annotations
+import hashlib
+import re
+import threading
+from typing import Dict, List, Sequence
+import numpy as np
+
+TOKEN = re.compile(r"[\w-]+")
+
+
+class HashEmbedder:
+    """`Embedder` without a model: a text is the normalized sum of fixed random word vectors.
+
+    Each word's vector is seeded from a hash of the word, so texts sharing
+    words are similar and results are the same on every run and machine.
+    `encode_ids` embeds texts given as rows of vocabulary indices without
+    building the strings, for bulk-loading millions of chapters.
+    """
+
+    def __init__(self, dim: int = 384, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self.model_id = f"hash-{dim}"
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        pass
+
+    def word_vector(self, word: str) -> np.ndarray:
+        vec = self._vectors.get(word)
+        if vec is None:
+            h = hashlib.blake2b(f"{self.seed}\0{word}".encode(), digest_size=8).digest()
+            vec = np.random.default_rng(int.from_bytes(h, "little")).standard_normal(self.dim).astype(np.float32)
+            with self._lock:
+                self._vectors[word] = vec
+        return vec
+
+    @staticmethod
+    def _normalize(out: np.ndarray) -> np.ndarray:
+        return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in TOKEN.findall(text.lower()):
+                out[i] += self.word_vector(word)
+        return self._normalize(out)
+
+    def encode_ids(self, ids: np.ndarray, vocab: Sequence[str], chunk: int = 4096) -> np.ndarray:
+        """Same as `encode([" ".join(vocab[i] for i in row) for row in ids])`, vectorized"""
+        table = np.stack([self.word_vector(w) for w in vocab])
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        for start in range(0, len(ids), chunk):
+            out[start:start + chunk] = table[ids[start:start + chunk]].sum(axis=1)
+        return self._normalize(out)
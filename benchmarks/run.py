@@ -0,0 +1,111 @@
+"""Run the benchmark scenarios and write the results as JSON.
+
+    python -m benchmarks.run                                   # all scenarios
+    python -m benchmarks.run --scenarios retrieval --sizes 1000 10000 --out before.json
+
+Everything runs offline: replies come from FakeLLM, embeddings from
+HashEmbedder; the ollama scenario talks to src.server.stub_ollama on localhost. Results record the git commit so runs can be compared.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import scenarios
+
+SCENARIOS = ("stepv2", "add_turn", "save", "retrieval", "ollama")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    import numpy
+    try:
+        import faiss
+        faiss_version = getattr(faiss, "__version__", "unknown")
+    except ImportError:
+        faiss_version = None
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "faiss": faiss_version,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="Chapter counts for the retrieval scenario")
+    parser.add_argument("--queries", type=int, default=100, help="Queries timed per retrieval method")
+    parser.add_argument("--recall-k", type=int, default=10, help="k of the recall@k measured for every index codec and tier")
+    parser.add_argument("--recall-max-size", type=int, default=100_000,
+                        help="Largest chapter count the retrieval scenario measures recall at (one index per tier and codec)")
+    parser.add_argument("--recall-codecs", nargs="+", choices=("flat", "fp16", "sq8", "pq"), default=["flat", "fp16", "sq8", "pq"],
+                        help="Index codecs the recall measurement builds (pq trains a quantizer per tier, the slowest)")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (384 = all-MiniLM-L6-v2)")
+    parser.add_argument("--turns", type=int, default=50, help="Turns timed by the stepv2 scenario")
+    parser.add_argument("--add-turns", type=int, default=500, help="Turns added by the add_turn scenario")
+    parser.add_argument("--saves", type=int, default=2000, help="Chapters saved by the save scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds every fake LLM call takes")
+    parser.add_argument("--no-speculate", action="store_true", help="Run stepv2 without speculative retrieval")
+    parser.add_argument("--ollama-calls", type=int, default=200, help="Calls timed per client and session mode by the ollama scenario")
+    parser.add_argument("--ollama-load", type=float, default=0.5, help="Seconds the stub Ollama takes to load the model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Result file (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "arguments": vars(args), "results": {}}
+    results = report["results"]
+    for name in args.scenarios:
+        t0 = time.perf_counter()
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        if name == "stepv2":
+            results[name] = scenarios.bench_stepv2(turns=args.turns, latency=args.llm_latency,
+                                                   speculative=not args.no_speculate, seed=args.seed)
+        elif name == "add_turn":
+            results[name] = scenarios.bench_add_turn(turns=args.add_turns, latency=args.llm_latency, seed=args.seed)
+        elif name == "save":
+            results[name] = scenarios.bench_save(n=args.saves, dim=args.dim, seed=args.seed)
+        elif name == "ollama":
+            results[name] = scenarios.bench_ollama(calls=args.ollama_calls, load=args.ollama_load,
+                                                   turns=args.turns, seed=args.seed)
+        elif name == "retrieval":
+            results[name] = {}
+            for size in args.sizes:
+                print(f"[bench] retrieval @ {size} chapters ...", file=sys.stderr, flush=True)
+                results[name][str(size)] = scenarios.bench_retrieval(size, queries=args.queries, dim=args.dim, seed=args.seed,
+                                                                           recall_k=args.recall_k,
+                                                                           recall_max_size=args.recall_max_size,
+                                                                           recall_codecs=args.recall_codecs)
+        print(f"[bench] {name} done in {time.perf_counter() - t0:.1f}s", file=sys.stderr, flush=True)
+
+    out = args.out
+    if out is None:
+        commit = (report["environment"]["commit"] or "nocommit")[:10]
+        out = os.path.join(ROOT, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"[bench] results written to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
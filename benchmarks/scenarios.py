@@ -0,0 +1,320 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, Sequence
+import numpy as np
+
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.hash_embedder import HashEmbedder
+from benchmarks.synthetic import VOCAB, SyntheticHistory
+from src.storage.chapter_storage import ChapterStorage
+from src.storage.daily_storage import DailyMemoryStorage
+
+
+def latency_stats(samples: Sequence[float]) -> Dict[str, float]:
+    """Summary of per-call latencies given in seconds, reported in milliseconds"""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {"n": int(len(ms)), "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)), "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max())}
+
+
+def _time_calls(fn: Callable[[str], object], inputs: Sequence[str], warmup: int = 5) -> Dict[str, float]:
+    for x in inputs[:warmup]:
+        fn(x)
+    samples = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - t0)
+    return latency_stats(samples)
+
+
+def load_chapters(store: ChapterStorage, history: SyntheticHistory, n: int, batch: int = 50_000) -> float:
+    """Bulk-insert `n` synthetic chapters with their embeddings, bypassing save(); returns seconds taken"""
+    t0 = time.perf_counter()
+    days, ids = history.chapter_ids(n)
+    store.embedding_dim  # records the embedder in the meta table
+    for start in range(0, n, batch):
+        rows = ids[start:start + batch]
+        vectors = store.embedder.encode_ids(rows, VOCAB)
+        with store.db.transaction() as conn:
+            conn.executemany('INSERT INTO chapters (day, memory, tags, embedding) VALUES (?, ?, ?, ?)',
+                             [(days[start + i], history.text(row), None, vectors[i].tobytes()) for i, row in enumerate(rows)])
+    return time.perf_counter() - t0
+
+
+def bench_recall(store: ChapterStorage, qs: Sequence[str], k: int = 10, seed: int = 0,
+                 codecs: Sequence[str] = ("flat", "fp16", "sq8", "pq"),
+                 tiers: Sequence[str] = ("flat", "hnsw", "ivf")) -> Dict[str, dict]:
+    """Recall@k and search latency (for the queries `qs`) of the store's vectors in every codec and tier, keyed by "tier/codec".
+
+    Each checkpoint is also reopened memory-mapped and measured again (`mmap`).
+    """
+    from src.storage.chapter_index import ChapterIndex
+
+    vectors = list(store.embedder.encode(qs))
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for tier in tiers:
+            for codec in codecs:
+                path = os.path.join(tmp, f"{tier}-{codec}.faiss")
+                t0 = time.perf_counter()
+                index = ChapterIndex(path, store.embedding_dim, store._stored_vectors, codec=codec,
+                                     ann=None if tier == "flat" else tier, ann_threshold=0)
+                index.checkpoint()
+                build = time.perf_counter() - t0
+                # below train_size a quantized codec stays flat; the result names the layout actually built
+                result = index.recall_at_k(k=k, n_queries=len(qs), seed=seed)
+                result["build_seconds"] = build
+                result["search"] = _time_calls(lambda v: index.search(v, k), vectors)
+                # the same checkpoint reopened memory-mapped should answer exactly the same
+                mapped = ChapterIndex(path, store.embedding_dim, store._stored_vectors, codec=codec,
+                                      ann=None if tier == "flat" else tier, ann_threshold=0, mmap=True)
+                report = mapped.recall_at_k(k=k, n_queries=len(qs), seed=seed)
+                result["mmap"] = {key: report[key] for key in ("recall", "top1", "recall_in_memory", "ok", "warning")
+                                  if key in report}
+                out[f"{tier}/{codec}"] = result
+    return out
+
+
+def bench_retrieval(size: int, queries: int = 100, dim: int = 384, days: int = 365, seed: int = 0,
+                    recall_k: int = 10, recall_max_size: int = 100_000,
+                    recall_codecs: Sequence[str] = ("flat", "fp16", "sq8", "pq")) -> dict:
+    """Search latency of the chapter store holding `size` chapters over `days` days.
+
+    Up to `recall_max_size` chapters it also records recall@`recall_k` of
+    every codec and tier against exact search (`bench_recall`).
+    """
+    history = SyntheticHistory(seed=seed, days=days)
+    qs = history.queries(queries)
+    mid = history.day(days // 2)
+    month = (mid, mid + timedelta(days=29))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChapterStorage(os.path.join(tmp, "chapters.db"), os.path.join(tmp, "chapters.faiss"),
+                               embedder=HashEmbedder(dim), warmup=False)
+        result = {"chapters": size, "dim": dim, "load_seconds": load_chapters(store, history, size)}
+        t0 = time.perf_counter()
+        store.index.checkpoint()  # replay from SQLite, and the ANN rebuild past the threshold
+        result["index_build_seconds"] = time.perf_counter() - t0
+        result["semantic_retrieve_global"] = _time_calls(lambda q: store.semantic_retrieve_global(q, top_k=5), qs)
+        result["semantic_retrieve_range_30d"] = _time_calls(
+            lambda q: store.semantic_retrieve_range(q, start=month[0], end=month[1], top_k=5), qs)
+        result["semantic_retrieve_day"] = _time_calls(lambda q: store.semantic_retrieve_day(q, mid, top_k=5), qs)
+        if store.lexical:
+            result["lexical_search"] = _time_calls(lambda q: store.lexical_search(q, 50), qs)
+            result["hybrid_search"] = _time_calls(lambda q: store.hybrid_search(q, top_k=5), qs)
+            result["hybrid_search_range_30d"] = _time_calls(
+                lambda q: store.hybrid_search(q, top_k=5, start=month[0], end=month[1]), qs)
+        if size <= recall_max_size:
+            result["recall"] = bench_recall(store, qs, k=recall_k, seed=seed, codecs=recall_codecs)
+        store.close()
+    return result
+
+
+def bench_save(n: int = 2000, dim: int = 384, seed: int = 0) -> dict:
+    """ChapterStorage.save throughput: embed, insert and add to the index, one chapter per call"""
+    chapters = SyntheticHistory(seed=seed).chapters(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChapterStorage(os.path.join(tmp, "chapters.db"), os.path.join(tmp, "chapters.faiss"),
+                               embedder=HashEmbedder(dim), warmup=False)
+        store.index  # opened once, not part of the timing
+        samples = []
+        t0 = time.perf_counter()
+        for chapter in chapters:
+            t1 = time.perf_counter()
+            store.save(chapter)
+            samples.append(time.perf_counter() - t1)
+        elapsed = time.perf_counter() - t0
+        if len(store.index) != n:
+            raise RuntimeError(f"{n} saves left {len(store.index)} vectors in the index")
+        store.close()
+    return {"chapters": n, "seconds": elapsed, "chapters_per_second": n / elapsed, "save": latency_stats(samples)}
+
+
+@contextlib.contextmanager
+def _partition(tmp: str, llm: FakeLLM, history: Optional[SyntheticHistory], chapters: int,
+               memory_options: Optional[dict] = None):
+    """A partition (src.memory.tenants) on a hash embedder, optionally preloaded with history"""
+    from src.memory.tenants import open_partition
+
+    embedder = HashEmbedder()
+    if history is not None:
+        # past chapters and their daily memories, so nothing is left for the rollup scheduler
+        store = ChapterStorage(os.path.join(tmp, "chapters.db"), os.path.join(tmp, "chapters.faiss"),
+                               embedder=embedder, warmup=False)
+        load_chapters(store, history, chapters)
+        store.close()
+        daily = DailyMemoryStorage(os.path.join(tmp, "memory.db"), embedder=embedder)
+        for memory in history.daily_memories():
+            daily.save(memory)
+        daily.close()
+    part = open_partition(tmp, llm, embedder=embedder, chapter_options=dict(warmup=False),
+                          memory_options=memory_options)
+    try:
+        yield part
+    finally:
+        part.close()
+
+
+def bench_stepv2(turns: int = 50, latency: float = 0.05, history_days: int = 90, chapters: int = 2000,
+                 speculative: bool = True, seed: int = 0) -> dict:
+    """Per-turn latency of ConversationEngine.stepv2 with every LLM call taking `latency` seconds"""
+    from src.engine.conversation_engine import ConversationEngine
+
+    # history ends before today, so the turns' own chapters don't collide with it
+    history = SyntheticHistory(seed=seed, start=date.today() - timedelta(days=history_days + 1), days=history_days)
+    messages = [user for _, user, _ in history.turns(turns)]
+    internal = FakeLLM(latency=latency, words=48, seed=seed)
+    reply = FakeLLM(latency=latency, words=64, seed=seed)
+    with tempfile.TemporaryDirectory() as tmp, _partition(tmp, internal, history, chapters) as part:
+        engine = ConversationEngine(llm=reply, memory=part.memory, aggr=part.aggr, meta=part.meta, speculative=speculative)
+        part.chapter_store.index  # opened once, not part of the timing
+        samples = []
+        for msg in messages:
+            t0 = time.perf_counter()
+            engine.stepv2(msg)
+            samples.append(time.perf_counter() - t0)
+        engine.close()
+        part.memory.flush()
+        return {"turns": turns, "llm_latency_ms": latency * 1000, "speculative": speculative,
+                "turn": latency_stats(samples), "reply_calls": reply.calls, "internal_calls": internal.calls,
+                "prompt_sizes": engine.last_prompt_sizes}
+
+
+def bench_add_turn(turns: int = 500, latency: float = 0.05, summarize_batch: int = 4, seed: int = 0) -> dict:
+    """AgentMemory.add_turn: per-call latency and the amortized cost including background summarization"""
+    history = SyntheticHistory(seed=seed)
+    pairs = [(user, ai) for _, user, ai in history.turns(turns)]
+    llm = FakeLLM(latency=latency, words=48, seed=seed)
+    with tempfile.TemporaryDirectory() as tmp, \
+            _partition(tmp, llm, None, 0, memory_options=dict(summarize_batch=summarize_batch)) as part:
+        samples = []
+        t0 = time.perf_counter()
+        for user, ai in pairs:
+            t1 = time.perf_counter()
+            part.memory.add_turn(user, ai)
+            samples.append(time.perf_counter() - t1)
+        calls_done = time.perf_counter() - t0
+        part.memory.flush()  # wait for the summaries, snapshots and chapters the turns caused
+        total = time.perf_counter() - t0
+    return {"turns": turns, "llm_latency_ms": latency * 1000, "summarize_batch": summarize_batch,
+            "add_turn": latency_stats(samples), "calls_seconds": calls_done, "total_seconds": total,
+            "amortized_ms": total / turns * 1000, "llm_calls": llm.calls}
+
+
+@contextlib.contextmanager
+def _stub_ollama(delay: float = 0.0, words: int = 8, load: float = 0.0):
+    """src.server.stub_ollama on a free localhost port, served from a thread; yields its base URL"""
+    from aiohttp import web
+    from src.server.stub_ollama import create_app
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app(delay, words, load))
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", 0).start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def _atime_calls(fn, inputs: Sequence[str], warmup: int = 5) -> Dict[str, float]:
+    for x in inputs[:warmup]:
+        await fn(x)
+    samples = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        await fn(x)
+        samples.append(time.perf_counter() - t0)
+    return latency_stats(samples)
+
+
+def _fresh_generate(base_url: str, prompt: str) -> str:
+    from src.llms.ollama_llm import OllamaLLM
+
+    llm = OllamaLLM(base_url, "stub")
+    try:
+        return llm.generate(prompt)
+    finally:
+        llm.close()
+
+
+async def _fresh_agenerate(base_url: str, prompt: str) -> str:
+    from src.llms.async_ollama_llm import AsyncOllamaLLM
+
+    llm = AsyncOllamaLLM(base_url, "stub")
+    try:
+        return await llm.agenerate(prompt)
+    finally:
+        await llm.close()
+
+
+async def _bench_async(base_url: str, prompts: Sequence[str]) -> dict:
+    from src.llms.async_ollama_llm import AsyncOllamaLLM
+
+    llm = AsyncOllamaLLM(base_url, "stub")
+    try:
+        pooled = await _atime_calls(llm.agenerate, prompts)
+    finally:
+        await llm.close()
+    return {"pooled": pooled, "fresh": await _atime_calls(lambda p: _fresh_agenerate(base_url, p), prompts)}
+
+
+def bench_ollama(calls: int = 200, load: float = 0.5, turns: int = 40, summarize_batches: Sequence[int] = (1, 4, 8),
+                 seed: int = 0) -> dict:
+    """OllamaLLM and AsyncOllamaLLM against the stub Ollama server on localhost.
+
+    Per-call latency with one pooled session and with a fresh session (a new
+    TCP connection) per call; load_duration of a cold and a warm model, and
+    with keep_alive=0; and prompt_eval_count of stepv2 replies per
+    summarize_batch, i.e. how much of the prompt layout the server reuses.
+    """
+    from src.engine.conversation_engine import ConversationEngine
+    from src.llms.ollama_llm import OllamaLLM, prompt_eval_summary
+
+    prompts = [user for _, user, _ in SyntheticHistory(seed=seed).turns(calls)]
+    result = {"calls": calls, "load_ms": load * 1000}
+    with _stub_ollama(load=load) as base_url:
+        llm = OllamaLLM(base_url, "stub")
+        llm.generate(prompts[0])
+        cold = llm.last_stats["load_duration"]
+        result["sync"] = {"pooled": _time_calls(llm.generate, prompts),
+                          "fresh": _time_calls(lambda p: _fresh_generate(base_url, p), prompts)}
+        warm = llm.last_stats["load_duration"]
+        llm.close()
+        result["async"] = asyncio.run(_bench_async(base_url, prompts))
+        unloading = OllamaLLM(base_url, "stub", keep_alive=0)
+        unloading.generate(prompts[0])
+        unloading.generate(prompts[1])
+        result["load_duration_ms"] = {"cold": cold / 1e6, "warm": warm / 1e6,
+                                      "keep_alive_0": unloading.last_stats["load_duration"] / 1e6}
+        unloading.close()
+
+    # the stub counts the prefix shared with the previous request, so each batch size gets its own
+    history = SyntheticHistory(seed=seed)
+    messages = [user for _, user, _ in history.turns(turns)]
+    result["prompt_layout"] = {}
+    for batch in summarize_batches:
+        with _stub_ollama() as base_url, tempfile.TemporaryDirectory() as tmp, \
+                _partition(tmp, FakeLLM(words=48, seed=seed), None, 0,
+                           dict(summarize_batch=batch, background=False)) as part:
+            reply = OllamaLLM(base_url, "stub")
+            engine = ConversationEngine(llm=reply, memory=part.memory, aggr=part.aggr, meta=part.meta,
+                                        speculative=False)
+            for msg in messages:
+                engine.stepv2(msg)  # memory jobs run inline, so each fold lands before the next turn
+            engine.close()
+            reply.close()
+            result["prompt_layout"][str(batch)] = prompt_eval_summary(engine.llm_stats)
+    return result
@@ -0,0 +1,106 @@
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+import numpy as np
+
+from src.core.memory_interface import Chapter, DailyMemory
+
+TOPICS = {
+    "work": "meeting deadline report manager sprint review launch roadmap client budget".split(),
+    "travel": "trip flight hotel mountains beach train passport itinerary hiking museum".split(),
+    "health": "doctor run gym sleep diet yoga appointment knee vitamins steps".split(),
+    "cooking": "recipe pasta curry oven bread spices market soup garlic breakfast".split(),
+    "finance": "invoice taxes savings rent salary stocks loan receipt refund insurance".split(),
+    "code": "bug deploy python database index query latency refactor test release".split(),
+    "family": "birthday parents sister wedding kids holiday gift call visit cousin".split(),
+    "music": "guitar concert playlist album band practice lesson song vinyl festival".split(),
+}
+FILLER = "we talked about the and then later also plan next discussed decided".split()
+# exact tokens (ticket numbers) that embeddings blur and full-text search finds
+CODES = [f"inc-{i:04d}" for i in range(1000)]
+
+TOPIC_NAMES = list(TOPICS)
+VOCAB = [w for name in TOPIC_NAMES for w in TOPICS[name]] + FILLER + CODES
+_TOPIC_IDS = []
+_offset = 0
+for _name in TOPIC_NAMES:
+    _TOPIC_IDS.append(np.arange(_offset, _offset + len(TOPICS[_name])))
+    _offset += len(TOPICS[_name])
+_FILLER_IDS = np.arange(_offset, _offset + len(FILLER))
+_CODE_IDS = np.arange(_offset + len(FILLER), len(VOCAB))
+
+
+class SyntheticHistory:
+    """Deterministic fake history: `days` days from `start`, each with a dominant topic.
+
+    Chapters are `words` words: mostly from a topic (the day's, 70% of the
+    time), some filler and one ticket code. Texts are built from vocabulary
+    ids, so `chapter_ids` plus `HashEmbedder.encode_ids` can embed a million
+    chapters without going through strings.
+    """
+
+    def __init__(self, seed: int = 0, start: date = date(2024, 1, 1), days: int = 90, words: int = 24):
+        self.seed = seed
+        self.start = start
+        self.days = days
+        self.words = words
+        self.day_topics = np.random.default_rng(seed).integers(len(TOPIC_NAMES), size=days)
+
+    def day(self, i: int) -> date:
+        return self.start + timedelta(days=i)
+
+    def _rows(self, rng: np.random.Generator, topics: np.ndarray) -> np.ndarray:
+        n = len(topics)
+        topical = self.words * 2 // 3
+        ids = np.empty((n, self.words), dtype=np.int64)
+        for t in range(len(TOPIC_NAMES)):
+            rows = np.nonzero(topics == t)[0]
+            ids[rows, :topical] = rng.choice(_TOPIC_IDS[t], size=(len(rows), topical))
+        ids[:, topical:-1] = rng.choice(_FILLER_IDS, size=(n, self.words - topical - 1))
+        ids[:, -1] = rng.choice(_CODE_IDS, size=n)
+        return ids
+
+    @staticmethod
+    def text(row: np.ndarray) -> str:
+        return " ".join(VOCAB[i] for i in row)
+
+    def chapter_ids(self, n: int) -> Tuple[List[str], np.ndarray]:
+        """ISO days and vocabulary-id rows of `n` chapters spread evenly over the days, oldest first"""
+        rng = np.random.default_rng(self.seed + 1)
+        day_idx = np.arange(n) * self.days // max(n, 1)
+        own = rng.random(n) < 0.7
+        topics = np.where(own, self.day_topics[day_idx], rng.integers(len(TOPIC_NAMES), size=n))
+        days = [self.day(int(i)).isoformat() for i in day_idx]
+        return days, self._rows(rng, topics)
+
+    def chapters(self, n: int) -> List[Chapter]:
+        days, ids = self.chapter_ids(n)
+        return [Chapter(day=date.fromisoformat(d), memory=self.text(row), tags=None) for d, row in zip(days, ids)]
+
+    def daily_memories(self) -> List[DailyMemory]:
+        rng = np.random.default_rng(self.seed + 2)
+        ids = self._rows(rng, self.day_topics)
+        return [DailyMemory(day=self.day(i), memory=self.text(row), tags=[TOPIC_NAMES[self.day_topics[i]]])
+                for i, row in enumerate(ids)]
+
+    def turns(self, n: int) -> List[Tuple[datetime, str, str]]:
+        """(time, user, ai) turns spread over the days"""
+        rng = np.random.default_rng(self.seed + 3)
+        day_idx = np.arange(n) * self.days // max(n, 1)
+        user = self._rows(rng, self.day_topics[day_idx])
+        ai = self._rows(rng, self.day_topics[day_idx])
+        out = []
+        for k, i in enumerate(day_idx):
+            when = datetime.combine(self.day(int(i)), datetime.min.time()) + timedelta(minutes=int(rng.integers(8 * 60, 22 * 60)))
+            out.append((when, self.text(user[k][:8]) + "?", self.text(ai[k])))
+        return out
+
+    def queries(self, n: int) -> List[str]:
+        """Questions about a topic, every other one naming a ticket code"""
+        rng = np.random.default_rng(self.seed + 4)
+        out = []
+        for k in range(n):
+            words = rng.choice(TOPICS[TOPIC_NAMES[rng.integers(len(TOPIC_NAMES))]], size=3, replace=False)
+            code = f" {CODES[rng.integers(len(CODES))]}" if k % 2 else ""
+            out.append(f"what did we say about {' '.join(words)}{code}?")
+        return out
@@ -9,12 +9,21 @@ class LLMConfig:
     provider: str # 'gemini' | 'ollama'
     model: str = ""
     base_url: str = "" # for ollama
+    keep_alive: str | int = "10m" # for ollama: keep the model loaded between calls ("10m", -1 = forever, 0 = unload)
+    chat: bool = False # for ollama: use /api/chat instead of /api/generate
     temperature: float = 0.2
 
+    def __post_init__(self):
+        # Ollama reads a string as a duration and rejects "-1"; bare numbers (seconds) must go out as JSON numbers
+        if isinstance(self.keep_alive, str) and self.keep_alive.lstrip("+-").isdigit():
+            self.keep_alive = int(self.keep_alive)
+
 
 
 
 @dataclass
 class AppConfig:
     llm: LLMConfig
-    summarize_every: int = 6
\ No newline at end of file
+    summarize_every: int = 6
+    summarize_batch: int = 4 # evicted turns folded per summarization call; the system prompt changes once per batch
+    context_budget: int = 3000 # tokens of reply prompt (preamble, memory, retrievals, user message)
\ No newline at end of file
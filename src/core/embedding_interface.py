@@ -0,0 +1,34 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Protocol, runtime_checkable
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@runtime_checkable
+class Embedder(Protocol):
+    """Text → vector backend used by the chapter store.
+
+
+    `encode` takes a batch of texts and returns an (n, dim) float32 array of
+    L2-normalized rows, so inner product is cosine similarity. `model_id`
+    names the vector space: vectors from different ids must not be mixed in
+    one index.
+    """
+
+
+    model_id: str
+
+
+    @property
+    def dim(self) -> int:
+        ...
+
+
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        ...
+
+
+    def warm_up(self) -> None:
+        """Start loading the model in the background (no-op if already loaded)."""
+        ...
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Protocol, runtime_checkable, Dict, Any, Optional
+from typing import Protocol, runtime_checkable, Dict, Any, AsyncIterator, Iterator, Optional
 
 
 @runtime_checkable
@@ -23,9 +23,36 @@ class LLMInterface(Protocol):
         The full prompt to send.
         options: Optional[Dict[str, Any]]
         Provider specific generation options (e.g., temperature).
+        `options["system"]`, if present, is a system prompt that goes in
+        front of `prompt`; keep it stable so providers can cache it.
         Returns
         -------
         str: model response text
         """
         ...
 
+
+    def stream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Streaming text generation.
+
+
+        Same parameters as `generate`; yields response text chunks as the
+        provider produces them. Joining the chunks gives the full response.
+        """
+        ...
+
+
+@runtime_checkable
+class AsyncLLMInterface(Protocol):
+    """Asyncio variant of `LLMInterface` for serving many sessions per process."""
+
+
+    async def agenerate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        """Async counterpart of `LLMInterface.generate`."""
+        ...
+
+
+    def astream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async counterpart of `LLMInterface.stream`."""
+        ...
+
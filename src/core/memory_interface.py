@@ -73,6 +73,11 @@ class MemoryInterface(Protocol):
         ...
 
 
+    def context_sections(self) -> Tuple[Optional[str], List[str]]:
+        """(rolling summary, recent turns oldest first) that `get_context` is made of"""
+        ...
+
+
     def summary(self) -> str:
         ...
 
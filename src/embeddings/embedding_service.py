@@ -0,0 +1,332 @@
+"""Local embedding daemon: one loaded model shared by every process on the host.
+
+    python -m src.embeddings.embedding_service --socket /tmp/recallnet-embed.sock --embedder all-MiniLM-L6-v2
+    python -m src.ui.cli --embedding-socket /tmp/recallnet-embed.sock
+
+Clients talk to it over a Unix socket with `RemoteEmbedder`, which falls
+back to encoding in-process while the daemon is unreachable. Requests that
+arrive within `window_ms` of each other are encoded as one batch.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+
+from src.core.embedding_interface import Embedder
+
+# frame: (header length, payload length), JSON header, raw payload
+FRAME = struct.Struct(">II")
+
+
+def _send(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    head = json.dumps(header).encode("utf-8")
+    sock.sendall(FRAME.pack(len(head), len(payload)) + head + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv(sock: socket.socket) -> Tuple[dict, bytes]:
+    head_len, payload_len = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    return header, _recv_exact(sock, payload_len)
+
+
+class MicroBatcher:
+    """Collects encode requests from many threads and runs them as batches.
+
+    A batch closes `window_ms` after its first request or once it holds
+    `max_batch` texts, whichever comes first.
+    """
+
+    def __init__(self, embedder: Embedder, window_ms: float = 5.0, max_batch: int = 64):
+        self.embedder = embedder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # stop after this batch
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._run(pending)
+
+    def _run(self, pending: List[Tuple[List[str], Future]]) -> None:
+        texts = [t for batch, _ in pending for t in batch]
+        try:
+            emb = self.embedder.encode(texts)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.texts += len(texts)
+        start = 0
+        for batch, future in pending:
+            future.set_result(emb[start:start + len(batch)])
+            start += len(batch)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+
+def _claim_socket(socket_path: str) -> None:
+    """Remove a socket file left by a crashed daemon; raise if a live daemon still answers on it"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"an embedding service is already listening on {socket_path}")
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    """Serves `info` and `encode` requests on a Unix socket, one thread per client connection"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embedder: Embedder, window_ms: float = 5.0, max_batch: int = 64):
+        # a socket file left by a crashed daemon would make bind fail
+        _claim_socket(socket_path)
+        self.socket_path = socket_path
+        self.embedder = embedder
+        self.batcher = MicroBatcher(embedder, window_ms=window_ms, max_batch=max_batch)
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: EmbeddingServer
+
+    def handle(self) -> None:
+        # a client keeps its connection open across requests
+        while True:
+            try:
+                header, _ = _recv(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                if header.get("op") == "info":
+                    _send(self.request, {"model_id": self.server.embedder.model_id, "dim": self.server.embedder.dim,
+                                         "batches": self.server.batcher.batches, "texts": self.server.batcher.texts})
+                elif header.get("op") == "encode":
+                    emb = self.server.batcher.submit(header["texts"]).result()
+                    emb = np.ascontiguousarray(emb, dtype=np.float32)
+                    _send(self.request, {"shape": list(emb.shape)}, emb.tobytes())
+                else:
+                    _send(self.request, {"error": f"unknown op {header.get('op')!r}"})
+            except Exception as e:
+                _send(self.request, {"error": str(e)})
+
+
+class RemoteEmbedder:
+    """`Embedder` backed by the local embedding daemon, with in-process fallback.
+
+    Args:
+    socket_path: the daemon's Unix socket
+    fallback: builds the in-process embedder used while the daemon is
+        unreachable (must be the same model the daemon serves)
+    model_id: the fallback's model id, known without loading it
+    timeout: seconds to wait on the daemon per request
+    retry_after: seconds before trying the daemon again after a failure
+    chunk_size: texts per encode request; larger inputs are sent in chunks,
+        so a big batch can't run into `timeout` and mark the daemon down
+
+    Each thread keeps its own connection to the daemon. The daemon is only
+    used once its model id (and dimension, when the fallback is loaded)
+    match the fallback's; otherwise ValueError is raised, as vectors of
+    the two would silently mix in one index.
+    """
+
+    def __init__(self, socket_path: str, fallback: Callable[[], Embedder], model_id: Optional[str] = None,
+                 timeout: float = 10.0, retry_after: float = 30.0, chunk_size: int = 256):
+        self.socket_path = socket_path
+        self.expected_model_id = model_id
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self._fallback_factory = fallback
+        self._fallback: Optional[Embedder] = None
+        self._info: Optional[dict] = None
+        self._down_until = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def fallback(self) -> Embedder:
+        with self._lock:
+            if self._fallback is None:
+                fallback = self._fallback_factory()
+                if self._info is not None:
+                    self._check_space(self._info, fallback)
+                self._fallback = fallback
+            return self._fallback
+
+    def _check_space(self, info: dict, fallback: Optional[Embedder]) -> None:
+        model_id = fallback.model_id if fallback is not None else self.expected_model_id
+        mismatch = model_id is not None and info["model_id"] != model_id
+        if fallback is not None and info["dim"] != fallback.dim:
+            mismatch = True
+        if mismatch:
+            local = f"{model_id!r}" + (f" ({fallback.dim}-d)" if fallback is not None else "")
+            raise ValueError(f"embedding service on {self.socket_path} serves {info['model_id']!r} "
+                             f"({info['dim']}-d), the in-process fallback is {local}")
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, header: dict) -> Optional[Tuple[dict, bytes]]:
+        """Round-trip to the daemon, None if it is unavailable"""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            sock = self._conn()
+            _send(sock, header)
+            reply = _recv(sock)
+        except OSError:
+            # covers a missing socket, refused/reset connections and timeouts
+            self._drop_conn()
+            self._down_until = time.monotonic() + self.retry_after
+            self._info = None  # the daemon may come back with another model
+            return None
+        if "error" in reply[0]:
+            raise RuntimeError(f"embedding service: {reply[0]['error']}")
+        return reply
+
+    def _drop_conn(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _daemon_info(self) -> Optional[dict]:
+        if self._info is None:
+            reply = self._request({"op": "info"})
+            if reply is not None:
+                with self._lock:
+                    fallback = self._fallback
+                self._check_space(reply[0], fallback)
+                self._info = reply[0]
+        return self._info
+
+    @property
+    def model_id(self) -> str:
+        info = self._daemon_info()
+        return info["model_id"] if info else self.fallback.model_id
+
+    @property
+    def dim(self) -> int:
+        info = self._daemon_info()
+        return info["dim"] if info else self.fallback.dim
+
+    @property
+    def remote(self) -> bool:
+        """Whether the daemon is currently in use"""
+        return self._daemon_info() is not None and time.monotonic() >= self._down_until
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        # a daemon is checked against the fallback before its first vectors are used
+        if self._daemon_info() is None:
+            return self.fallback.encode(texts)
+        parts = []
+        for start in range(0, max(len(texts), 1), self.chunk_size):
+            chunk = texts[start:start + self.chunk_size]
+            reply = self._request({"op": "encode", "texts": chunk})
+            if reply is None:
+                parts.append(self.fallback.encode(chunk))
+                continue
+            header, payload = reply
+            parts.append(np.frombuffer(payload, dtype=np.float32).reshape(header["shape"]))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def warm_up(self) -> None:
+        # only load the local model if the daemon is not there to do the work
+        if self._daemon_info() is None:
+            self.fallback.warm_up()
+
+
+def main(argv=None):
+    from src.embeddings.factory import make_embedder
+
+    parser = argparse.ArgumentParser(description="Shared embedding service over a Unix socket")
+    parser.add_argument("--socket", default="/tmp/recallnet-embed.sock")
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2", help="sentence-transformers model name, or onnx:<dir>")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="How long a batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=64, help="Texts per encode call at most")
+    args = parser.parse_args(argv)
+
+    _claim_socket(args.socket)  # before loading the model, a second daemon exits right away
+    embedder = make_embedder(args.embedder)
+    embedder.encode(["warm up"])  # load the model before accepting clients
+    server = EmbeddingServer(args.socket, embedder, window_ms=args.window_ms, max_batch=args.max_batch)
+    print(f"embedding service: {embedder.model_id} ({embedder.dim}-d) on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
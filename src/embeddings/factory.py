@@ -0,0 +1,33 @@
+from __future__ import annotations
+import os
+from typing import Optional
+
+from src.core.embedding_interface import Embedder
+
+
+def make_embedder(spec: str, socket_path: Optional[str] = None) -> Embedder:
+    """Embedder from a CLI-style spec.
+
+    'onnx:<dir>'       ONNX export in <dir>, int8-quantized, no torch
+    'onnx-fp32:<dir>'  same without quantization
+    anything else      a sentence-transformers model name, e.g. 'all-MiniLM-L6-v2'
+
+    With `socket_path`, encoding goes to the embedding daemon listening
+    there, and `spec` is only loaded in-process while the daemon is unreachable.
+    """
+    if socket_path:
+        from src.embeddings.embedding_service import RemoteEmbedder
+        return RemoteEmbedder(socket_path, fallback=lambda: make_embedder(spec), model_id=spec_model_id(spec))
+    if spec.startswith("onnx:") or spec.startswith("onnx-fp32:"):
+        from src.embeddings.onnx_embedder import OnnxEmbedder
+        kind, model_dir = spec.split(":", 1)
+        return OnnxEmbedder(model_dir, quantize=kind == "onnx")
+    from src.embeddings.sentence_transformer_embedder import SentenceTransformerEmbedder
+    return SentenceTransformerEmbedder(spec)
+
+
+def spec_model_id(spec: str) -> str:
+    """Model id `make_embedder(spec)` will report, without loading the model"""
+    if spec.startswith("onnx:") or spec.startswith("onnx-fp32:"):
+        return os.path.basename(os.path.normpath(spec.split(":", 1)[1]))
+    return spec
@@ -0,0 +1,45 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Optional
+
+
+class LazyEmbedder:
+    """Base for embedders whose model is loaded on first use (or warmed up in the background).
+
+    Importing the inference stack (torch, onnxruntime) and loading weights
+    takes seconds; neither should hold up startup for turns that never embed
+    anything. One instance can be shared by several stores.
+    Subclasses implement `_load()`.
+    """
+
+    model_id: str = ""
+
+    def __init__(self) -> None:
+        self.load_seconds: Optional[float] = None
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self._warming = False
+
+    def _load(self) -> Any:
+        raise NotImplementedError
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    t0 = time.perf_counter()
+                    self._model = self._load()
+                    self.load_seconds = time.perf_counter() - t0
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self) -> None:
+        """Load the model on a background thread; first use waits for it if still loading"""
+        if self._model is None and not self._warming:
+            self._warming = True
+            threading.Thread(target=lambda: self.model, name="embedder-warmup", daemon=True).start()
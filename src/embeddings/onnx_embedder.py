@@ -0,0 +1,101 @@
+from __future__ import annotations
+import json
+import os
+from typing import List, Optional
+import numpy as np
+
+from src.embeddings.lazy_embedder import LazyEmbedder
+
+
+class OnnxEmbedder(LazyEmbedder):
+    """Sentence-transformer exported to ONNX, run on CPU with ONNX Runtime; no torch.
+
+    Args:
+    model_dir: an ONNX export of the model with its tokenizer, e.g.
+        `optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 minilm-onnx/`
+        (needs model.onnx and tokenizer.json; config.json gives the dimension)
+    quantize: run an int8 dynamically quantized copy (model_int8.onnx, created
+        next to model.onnx on first use); several times smaller and faster on CPU
+    model_id: name of the vector space; defaults to the directory name. Pass the
+        source model's name (e.g. 'all-MiniLM-L6-v2') to keep using an index built with it
+    max_length: tokens per text, longer texts are truncated (sentence-transformers uses 256 for MiniLM)
+    threads: ONNX Runtime intra-op threads (None = runtime default)
+
+    Texts are encoded in length-sorted batches of `batch_size` to keep padding small,
+    then mean-pooled over the attention mask and L2-normalized like sentence-transformers.
+    """
+
+    def __init__(self, model_dir: str, quantize: bool = True, model_id: Optional[str] = None,
+                 max_length: int = 256, batch_size: int = 32, threads: Optional[int] = None):
+        super().__init__()
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.model_id = model_id or os.path.basename(os.path.normpath(model_dir))
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.threads = threads
+        self._dim: Optional[int] = None
+
+    def _model_path(self) -> str:
+        path = os.path.join(self.model_dir, "model.onnx")
+        if not self.quantize:
+            return path
+        quantized = os.path.join(self.model_dir, "model_int8.onnx")
+        if not os.path.exists(quantized):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+        return quantized
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        opts = ort.SessionOptions()
+        if self.threads:
+            opts.intra_op_num_threads = self.threads
+        session = ort.InferenceSession(self._model_path(), sess_options=opts, providers=["CPUExecutionProvider"])
+        tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.max_length)
+        tokenizer.enable_padding()
+        return session, tokenizer
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            config = os.path.join(self.model_dir, "config.json")
+            if os.path.exists(config):
+                with open(config, encoding="utf-8") as f:
+                    self._dim = int(json.load(f)["hidden_size"])
+            else:
+                self._dim = int(self.encode(["dimension probe"]).shape[1])
+        return self._dim
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        session, tokenizer = self.model
+        encodings = tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": mask}
+        names = {i.name for i in session.get_inputs()}
+        if "token_type_ids" in names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = session.run(None, {k: v for k, v in feeds.items() if k in names})[0]
+        if hidden.ndim == 2:
+            # export already pooled
+            return hidden.astype(np.float32)
+        # mean pooling over real tokens
+        m = mask[:, :, None].astype(np.float32)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        parts = []
+        for i in range(0, len(texts), self.batch_size):
+            idx = order[i:i + self.batch_size]
+            parts.append((idx, self._encode_batch([texts[j] for j in idx])))
+        if parts:
+            out = np.empty((len(texts), parts[0][1].shape[1]), dtype=np.float32)
+            for idx, emb in parts:
+                out[idx] = emb
+        return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from typing import List
+import numpy as np
+
+from src.embeddings.lazy_embedder import LazyEmbedder
+
+
+class SentenceTransformerEmbedder(LazyEmbedder):
+    """sentence-transformers model (torch), e.g. 'all-MiniLM-L6-v2'.
+
+    sentence_transformers, and with it torch, is imported when the model is
+    first needed.
+    """
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', batch_size: int = 32):
+        super().__init__()
+        self.model_id = model_name
+        self.batch_size = batch_size
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_id)
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        emb = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        emb = emb.astype(np.float32).reshape(len(texts), -1)
+        return emb / np.linalg.norm(emb, axis=1, keepdims=True)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+from concurrent.futures import Executor
+from typing import Optional, Dict, Any, AsyncIterator
+import asyncio
+
+from src.core.llm_interface import AsyncLLMInterface
+from src.core.memory_interface import MemoryInterface
+from src.engine.context_builder import BuiltPrompt, ContextBuilder
+from src.memory.metacognition import MetaCognition
+
+
+
+
+class AsyncConversationEngine:
+    """Asyncio counterpart of `ConversationEngine.stepv2` for one session.
+
+    LLM calls are awaited on `llm`; retrieval and memory updates (SQLite,
+    FAISS, file I/O) run in worker threads so the event loop stays free for
+    other sessions. Turns of the same session are serialized. With an
+    `executor`, likely retrievals start on it while the decision is pending.
+    """
+
+
+    def __init__(self, llm: AsyncLLMInterface, memory: MemoryInterface, meta: MetaCognition,
+                 executor: Optional[Executor] = None, context_builder: Optional[ContextBuilder] = None) -> None:
+        self.llm = llm
+        self.memory = memory
+        self.meta = meta
+        self.executor = executor
+        self.context_builder = context_builder or ContextBuilder()
+        self.last_prompt_sizes: Dict[str, int] = {}
+        self._turn_lock = asyncio.Lock()
+
+
+    async def _build_prompt(self, user_msg: str) -> BuiltPrompt:
+        mem_ctx = self.memory.get_context()
+
+        # 1. Analyze retrieval need, locally when the fast router can tell
+        speculation = self.meta.speculate(user_msg, self.executor) if self.executor else None
+        try:
+            decision = await asyncio.to_thread(self.meta.route, user_msg, mem_ctx,
+                                               speculation.query_emb if speculation else None)
+            if decision is None:
+                decision = self.meta.parse_decision(await self.llm.agenerate(self.meta.analysis_prompt(user_msg, mem_ctx)))
+        except BaseException:
+            if speculation:
+                speculation.cancel()
+            raise
+
+        # 2. Perform retrieval
+        retrievals = await asyncio.to_thread(self.meta.retrieve, decision, speculation)
+
+        # 3. Build prompt within the token budget
+        built = self.context_builder.build(user_msg, *self.memory.context_sections(), retrievals)
+        self.last_prompt_sizes = built.sizes
+        return built
+
+
+    async def astep(self, user_msg: str, *, gen_options: Optional[Dict[str, Any]] = None) -> str:
+        async with self._turn_lock:
+            built = await self._build_prompt(user_msg)
+            # the stable prefix goes as the system prompt
+            ai = await self.llm.agenerate(built.prompt, options={**(gen_options or {}), "system": built.system})
+            await asyncio.to_thread(self.memory.add_turn, user_msg, ai)
+            return ai
+
+
+    async def astream_step(self, user_msg: str, *, gen_options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Yields the reply as it is generated; memory is updated once the stream has finished."""
+        async with self._turn_lock:
+            built = await self._build_prompt(user_msg)
+            chunks = []
+            async for chunk in self.llm.astream(built.prompt, options={**(gen_options or {}), "system": built.system}):
+                chunks.append(chunk)
+                yield chunk
+            await asyncio.to_thread(self.memory.add_turn, user_msg, "".join(chunks).strip())
@@ -0,0 +1,167 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+
+SYSTEM_PREAMBLE = (
+    "You are a helpful, concise assistant. Use provided MEMORY if relevant.\n"
+    "If information is missing, ask a brief follow-up question."
+    )
+
+# section labels and separators `assemble_prompt` adds around the content
+SCAFFOLD = "\n\nMEMORY:\n[ROLLING SUMMARY]\n\n\n[RECENT TURNS]\n\n\nRetrieved Knowledge:\n\n\nUser: \nAI:"
+
+# text -> token count
+Tokenizer = Callable[[str], int]
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token, used when no real tokenizer is plugged in
+    return len(text) // 4 + 1
+
+
+def hf_tokenizer(name: str) -> Tokenizer:
+    """Token counter backed by a Hugging Face tokenizer (e.g. the served model's)"""
+    from transformers import AutoTokenizer  # only needed when asked for
+    tok = AutoTokenizer.from_pretrained(name)
+    return lambda text: len(tok.encode(text, add_special_tokens=False))
+
+
+def retrieval_text(r) -> str:
+    # semantic strategies return {"chapter", "score"} hits, "day" (and "period", after its hits) DailyMemory rows
+    return r["chapter"].memory if isinstance(r, dict) else r.memory
+
+
+def memory_block(summary: Optional[str], recent: List[str]) -> str:
+    """The MEMORY section as `AgentMemory.get_context` lays it out"""
+    parts = []
+    if summary:
+        parts.append(f"[ROLLING SUMMARY]\n{summary}")
+    if recent:
+        parts.append("[RECENT TURNS]\n" + "\n".join(recent))
+    return "\n\n".join(parts)
+
+
+def system_prompt(summary: Optional[str]) -> str:
+    """Preamble + rolling summary: the part that only changes when evicted turns are folded into the summary"""
+    prompt_parts = [SYSTEM_PREAMBLE]
+
+    if summary:
+        prompt_parts.append(f"MEMORY:\n[ROLLING SUMMARY]\n{summary}")
+    return "\n\n".join(prompt_parts)
+
+
+def turn_prompt(user_msg: str, retrievals, recent: Optional[List[str]] = None) -> str:
+    """Recent turns + retrieved knowledge + user message: what changes every turn"""
+    prompt_parts = []
+
+    # a sliding window, its first turn changes every turn once it is full
+    if recent:
+        prompt_parts.append("[RECENT TURNS]\n" + "\n".join(recent))
+    if retrievals:
+        prompt_parts.append("Retrieved Knowledge:\n" + "\n".join([retrieval_text(r) for r in retrievals]))
+
+    prompt_parts.append(f"User: {user_msg}\nAI:")
+    return "\n\n".join(prompt_parts)
+
+
+def assemble_prompt(user_msg: str, summary: Optional[str], recent: List[str], retrievals) -> str:
+    """Preamble + summary + recent turns + retrieved knowledge + user message"""
+    return system_prompt(summary) + "\n\n" + turn_prompt(user_msg, retrievals, recent)
+
+
+@dataclass
+class BuiltPrompt:
+    system: str  # slowly changing prefix, sent as options["system"]
+    prompt: str  # per-turn part
+    sizes: Dict[str, int] = field(default_factory=dict)  # tokens per section, plus what was dropped
+
+    @property
+    def text(self) -> str:
+        """The whole prompt as one string"""
+        return self.system + "\n\n" + self.prompt
+
+
+class ContextBuilder:
+    """Assembles the reply prompt within a token budget.
+
+    The prompt is laid out stable part first: preamble and rolling summary
+    go in `BuiltPrompt.system`; recent turns, retrievals and the user message
+    in `prompt`. Providers that cache a prompt prefix reuse the system part
+    for as long as the summary stays the same, i.e. `summarize_batch` turns
+    once the recent window is full.
+
+    The preamble and the user message are always sent. What is left of
+    `budget` goes, in priority order, to the recent turns (newest first),
+    the rolling summary (truncated if it does not fit whole) and the
+    retrievals by descending score. Token counts come from `tokenizer` and
+    are cached per text, so memory items that stay in context across turns
+    are counted once.
+    """
+
+    def __init__(self, budget: int = 3000, tokenizer: Tokenizer = approx_tokens, cache_size: int = 4096):
+        self.budget = budget
+        self.tokenizer = tokenizer
+        self.count = lru_cache(maxsize=cache_size)(tokenizer)
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        """Longest head of `text` within `tokens`"""
+        if tokens <= 0:
+            return ""
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.tokenizer(text[:mid]) <= tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
+
+    def build(self, user_msg: str, summary: Optional[str], recent: List[str], retrievals) -> BuiltPrompt:
+        """`recent` is oldest first, as `AgentMemory.context_sections` returns it"""
+        sizes = {"preamble": self.count(SYSTEM_PREAMBLE + SCAFFOLD), "user": self.count(user_msg)}
+        left = self.budget - sizes["preamble"] - sizes["user"]
+
+        # 1. recent turns, newest first, kept in chronological order
+        kept_turns: List[str] = []
+        sizes["recent"] = 0
+        for turn in reversed(recent):
+            n = self.count(turn)
+            if n > left:
+                break
+            kept_turns.insert(0, turn)
+            sizes["recent"] += n
+            left -= n
+        sizes["dropped_turns"] = len(recent) - len(kept_turns)
+
+        # 2. rolling summary, cut short rather than dropped
+        sizes["summary"] = 0
+        if summary:
+            n = self.count(summary)
+            if n > left:
+                summary = self._truncate(summary, left)
+                n = self.tokenizer(summary) if summary else 0
+            sizes["summary"] = n
+            left -= n
+
+        # 3. retrievals by score, skipping any that no longer fit
+        ranked = sorted(retrievals or [], key=lambda r: r.get("score", 0.0) if isinstance(r, dict) else 0.0,
+                        reverse=True)
+        kept_retrievals = []
+        sizes["retrievals"] = 0
+        for r in ranked:
+            n = self.count(retrieval_text(r))
+            if n > left:
+                continue
+            kept_retrievals.append(r)
+            sizes["retrievals"] += n
+            left -= n
+        sizes["dropped_retrievals"] = len(ranked) - len(kept_retrievals)
+
+        built = BuiltPrompt(system=system_prompt(summary),
+                            prompt=turn_prompt(user_msg, kept_retrievals, kept_turns), sizes=sizes)
+        # one-off texts are counted uncached
+        sizes["total"] = self.tokenizer(built.text)
+        sizes["budget"] = self.budget
+        return built
@@ -1,31 +1,33 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
-from rich.console import Console
-from rich.panel import Panel
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List
 
 from src.core.llm_interface import LLMInterface
 from src.core.memory_interface import MemoryInterface
+from src.engine.context_builder import SYSTEM_PREAMBLE, BuiltPrompt, ContextBuilder
 from src.memory.aggregator import Aggregator
 from src.memory.metacognition import MetaCognition
 
 
-SYSTEM_PREAMBLE = (
-    "You are a helpful, concise assistant. Use provided MEMORY if relevant.\n"
-    "If information is missing, ask a brief follow-up question."
-    )
-
-
 
 
 class ConversationEngine:
     """Coordinates Memory + LLM for a single-session conversation."""
 
 
-    def __init__(self, llm: LLMInterface, memory: MemoryInterface, aggr: Aggregator, meta:MetaCognition) -> None:
+    def __init__(self, llm: LLMInterface, memory: MemoryInterface, aggr: Aggregator, meta:MetaCognition,
+                 speculative: bool = True, context_builder: Optional[ContextBuilder] = None,
+                 show_prompt: bool = False) -> None:
         self.llm = llm
         self.memory = memory
         self.aggr = aggr
         self.meta = meta
+        self.context_builder = context_builder or ContextBuilder()
+        self.show_prompt = show_prompt  # print every reply prompt (debugging)
+        self.last_prompt_sizes: Dict[str, int] = {}
+        self.llm_stats: List[Dict[str, Any]] = []  # provider timings per reply
+        # retrievals started while metacognition decides, see MetaCognition.speculate
+        self._speculation_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="speculate") if speculative else None
 
 
     def step(self, user_msg: str, *, gen_options: Optional[Dict[str, Any]] = None) -> str:
@@ -43,32 +45,59 @@ class ConversationEngine:
         return ai
 
     def stepv2(self, user_msg: str, *, gen_options=None) -> str:
-        mem_ctx = self.memory.get_context()
+        built = self._build_prompt_v2(user_msg)
 
-        # 1. Analyze retrieval need
-        decision = self.meta.analyze(user_msg, mem_ctx)
+        # 4. Generate, the stable prefix goes as the system prompt
+        ai = self.llm.generate(built.prompt, options={**(gen_options or {}), "system": built.system})
+        self._record_stats()
+        self.memory.add_turn(user_msg, ai)
+        return ai
 
-        # 2. Perform retrieval
-        retrievals = self.meta.retrieve(decision)
+    def stream_stepv2(self, user_msg: str, *, gen_options=None) -> Iterator[str]:
+        """Like stepv2 but yields the reply as it is generated.
 
-        # 3. Build prompt
-        prompt_parts = [SYSTEM_PREAMBLE]
+        Memory is updated once the stream has finished.
+        """
+        built = self._build_prompt_v2(user_msg)
 
-       
-        if mem_ctx:
-            prompt_parts.append(f"MEMORY:\n{mem_ctx}")
+        # 4. Generate, the stable prefix goes as the system prompt
+        chunks = []
+        for chunk in self.llm.stream(built.prompt, options={**(gen_options or {}), "system": built.system}):
+            chunks.append(chunk)
+            yield chunk
+        self._record_stats()
+        self.memory.add_turn(user_msg, "".join(chunks).strip())
 
-        if retrievals:
-            prompt_parts.append("Retrieved Knowledge:\n" + "\n".join([r.memory for r in retrievals]))
+    def _record_stats(self) -> None:
+        # providers that report timings (Ollama) show how much of the prompt was evaluated again
+        stats = getattr(self.llm, "last_stats", None)
+        if stats:
+            self.llm_stats.append(dict(stats))
 
-        prompt_parts.append(f"User: {user_msg}\nAI:")
-        full_prompt = "\n\n".join(prompt_parts)
+    def _build_prompt_v2(self, user_msg: str) -> BuiltPrompt:
+        mem_ctx = self.memory.get_context()
 
-        # 4. Generate
-        print('-'*50)
-        console = Console()
-        console.print(Panel(full_prompt, title="FULL PROMPT", expand=False))
-        print('-'*50)
-        ai = self.llm.generate(full_prompt, options=gen_options)
-        self.memory.add_turn(user_msg, ai)
-        return ai
\ No newline at end of file
+        # 1. Analyze retrieval need, with likely retrievals already running
+        speculation = self.meta.speculate(user_msg, self._speculation_pool) if self._speculation_pool else None
+        decision = self.meta.analyze(user_msg, mem_ctx, speculation)
+
+        # 2. Perform retrieval
+        retrievals = self.meta.retrieve(decision, speculation)
+
+        # 3. Build prompt within the token budget
+        built = self.context_builder.build(user_msg, *self.memory.context_sections(), retrievals)
+        self.last_prompt_sizes = built.sizes
+
+        if self.show_prompt:
+            from rich.console import Console
+            from rich.panel import Panel
+            print('-'*50)
+            console = Console()
+            sizes = ", ".join(f"{k}={v}" for k, v in built.sizes.items())
+            console.print(Panel(built.text, title="FULL PROMPT", subtitle=sizes, expand=False))
+            print('-'*50)
+        return built
+
+    def close(self) -> None:
+        if self._speculation_pool:
+            self._speculation_pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Optional, Dict, Any, AsyncIterator
+import asyncio
+import json
+import aiohttp
+
+
+from src.core.llm_interface import AsyncLLMInterface
+from src.llms.ollama_llm import STAT_KEYS, ollama_payload, response_text
+
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+
+
+class AsyncOllamaLLM(AsyncLLMInterface):
+    """Ollama HTTP API client for asyncio.
+
+
+    Same options as `OllamaLLM`. All calls share one aiohttp session, created
+    on first use inside the running loop, whose connector pools up to
+    `pool_size` keep-alive connections.
+    """
+
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3", *,
+                 keep_alive: Optional[str | int] = "10m", connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 retries: int = 3, backoff: float = 0.5, pool_size: int = 100, chat: bool = False,
+                 **defaults: Any) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.chat = chat
+        self.url = f"{self.base_url}/api/chat" if chat else f"{self.base_url}/api/generate"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.defaults: Dict[str, Any] = {"temperature": 0.2, **defaults}
+        self.last_stats: Dict[str, Any] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._session
+
+
+    def _payload(self, prompt: str, stream: bool, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return ollama_payload(self.model, prompt, stream, self.chat, self.keep_alive, {**self.defaults, **(options or {})})
+
+
+    async def _post(self, payload: Dict[str, Any]) -> aiohttp.ClientResponse:
+        """POST to the generate/chat endpoint, retrying connection failures and 429/5xx with backoff"""
+        url = self.url
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp = await self._client().post(url, json=payload)
+            except aiohttp.ClientConnectorError:
+                if last:
+                    raise
+            else:
+                if resp.status < 400:
+                    return resp
+                resp.release()
+                if last or resp.status not in RETRY_STATUSES:
+                    resp.raise_for_status()
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise RuntimeError("unreachable")
+
+
+    async def agenerate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        async with await self._post(self._payload(prompt, False, options)) as resp:
+            data = await resp.json()
+        self.last_stats = {k: data[k] for k in STAT_KEYS if k in data}
+        return response_text(data).strip()
+
+
+    async def astream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        async with await self._post(self._payload(prompt, True, options)) as resp:
+            # one JSON object per line, the last one has done=true
+            async for line in resp.content:
+                line = line.strip()
+                if not line:
+                    continue
+                data = json.loads(line)
+                chunk = response_text(data)
+                if chunk:
+                    yield chunk
+                if data.get("done"):
+                    self.last_stats = {k: data[k] for k in STAT_KEYS if k in data}
+                    break
+
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
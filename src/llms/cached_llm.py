@@ -0,0 +1,159 @@
+from __future__ import annotations
+from typing import Optional, Dict, Any, Iterator
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+from src.core.llm_interface import LLMInterface
+
+
+
+
+class CachedLLM(LLMInterface):
+    """Persistent response cache in front of any `LLMInterface`.
+
+
+    Meant for the internal, low-temperature calls (summaries, chapter merges,
+    daily rollups, metacognition) that come back identical after restarts and
+    replays, not for chat replies.
+
+    Args:
+    llm: the wrapped client
+    path: SQLite file holding the cache
+    provider / model: part of the key; default to the client's class name and `model` attribute
+    ttl: seconds an entry stays valid (None = forever)
+    max_entries: least recently used entries beyond this are evicted
+    bypass: skip the cache (calls go straight to `llm`, nothing is stored)
+
+    Entries are keyed on provider, model, a hash of the prompt and the
+    generation options (the client's defaults merged with per-call ones).
+    `stats()` reports hits, misses and the hit rate.
+    """
+
+
+    def __init__(self, llm: LLMInterface, path: str = "llm_cache.db", *, provider: Optional[str] = None,
+                 model: Optional[str] = None, ttl: Optional[float] = None, max_entries: int = 10_000,
+                 bypass: bool = False) -> None:
+        self.llm = llm
+        self.provider = provider or type(llm).__name__
+        self.model = model if model is not None else getattr(llm, "model", "")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache(last_used)")
+        self.conn.commit()
+        self.prune()
+
+
+    def _key(self, prompt: str, options: Optional[Dict[str, Any]]) -> str:
+        params = {**getattr(self.llm, "defaults", {}), **(options or {})}
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = json.dumps([self.provider, self.model, prompt_hash, params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and row[1] < now - self.ttl:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+
+    def _put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO llm_cache (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                              (key, response, now, now))
+            # keep the max_entries most recently used
+            cur = self.conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self.evictions += cur.rowcount
+            self.conn.commit()
+
+
+    def generate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        if self.bypass:
+            return self.llm.generate(prompt, options=options)
+        key = self._key(prompt, options)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        response = self.llm.generate(prompt, options=options)
+        self._put(key, response)
+        return response
+
+
+    def stream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        if self.bypass:
+            yield from self.llm.stream(prompt, options=options)
+            return
+        key = self._key(prompt, options)
+        cached = self._get(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in self.llm.stream(prompt, options=options):
+            chunks.append(chunk)
+            yield chunk
+        # only complete responses are cached
+        self._put(key, "".join(chunks).strip())
+
+
+    def prune(self) -> int:
+        """Drop entries older than `ttl`; returns how many"""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+            self.conn.commit()
+            self.evictions += cur.rowcount
+            return cur.rowcount
+
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
+
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+from concurrent.futures import Executor
+from typing import Optional, Dict, Any, AsyncIterator
+import asyncio
+import functools
+
+
+from src.core.llm_interface import AsyncLLMInterface, LLMInterface
+
+
+
+
+class ExecutorLLM(AsyncLLMInterface):
+    """Async view of a blocking `LLMInterface` (e.g. GeminiLLM).
+
+
+    Calls run on `executor` (the loop's default thread pool if None) so they
+    never block the event loop.
+    """
+
+
+    def __init__(self, llm: LLMInterface, executor: Optional[Executor] = None) -> None:
+        self.llm = llm
+        self.executor = executor
+
+
+    async def agenerate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.llm.generate, prompt, options=options))
+
+
+    async def astream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            # runs on the executor; hands chunks back to the loop as they arrive
+            try:
+                for chunk in self.llm.stream(prompt, options=options):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+
+
+    async def close(self) -> None:
+        close = getattr(self.llm, "close", None)
+        if close:
+            close()
@@ -1,14 +1,8 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 import os
 
 
-try:
-    import google.generativeai as genai # type: ignore
-except Exception: # pragma: no cover
-    genai = None # allow import without dependency during scaffold
-
-
 from src.core.llm_interface import LLMInterface
 
 
@@ -30,16 +24,38 @@ class GeminiLLM(LLMInterface):
         self.defaults: Dict[str, Any] = {"temperature": 0.3, **defaults}
         if not self.api_key:
             raise ValueError("Gemini API key missing. Set GEMINI_API_KEY or pass api_key.")
-        if genai is None:
+        # the SDK is slow to import, only load it when this provider is used
+        try:
+            import google.generativeai as genai # type: ignore
+        except Exception: # pragma: no cover
             raise RuntimeError("google-generativeai package not installed. Add it to requirements.")
         genai.configure(api_key=self.api_key)
         self._model = genai.GenerativeModel(self.model)
 
 
-    def generate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+    def _split(self, prompt: str, options: Optional[Dict[str, Any]]):
+        # options["system"] goes in front of the prompt, the rest is generation config
         params = {**self.defaults, **(options or {})}
+        system = params.pop("system", None)
+        return (f"{system}\n\n{prompt}" if system else prompt), params
+
+
+    def generate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
+        prompt, params = self._split(prompt, options)
         resp = self._model.generate_content(prompt, generation_config=params)
         # SDK returns a rich object; extract text safely
         txt = getattr(resp, "text", None) or (resp.candidates[0].content.parts[0].text if resp.candidates else "")
         return txt.strip()
 
+
+    def stream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        prompt, params = self._split(prompt, options)
+        for chunk in self._model.generate_content(prompt, generation_config=params, stream=True):
+            try:
+                txt = chunk.text
+            except ValueError:
+                # chunk without text parts (e.g. safety/finish metadata)
+                continue
+            if txt:
+                yield txt
+
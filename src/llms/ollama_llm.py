@@ -1,11 +1,61 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List
+import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 from src.core.llm_interface import LLMInterface
 
 
+# timing/count fields Ollama reports on the final response object
+STAT_KEYS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+
+def ollama_payload(model: str, prompt: str, stream: bool, chat: bool, keep_alive: Optional[str | int],
+                   params: Dict[str, Any]) -> Dict[str, Any]:
+    """Request body for /api/chat (`chat`) or /api/generate.
+
+    `params["system"]` becomes the system message (chat) or the `system`
+    field (generate), so the stable part of a prompt reaches the model as a
+    prefix the server can keep in its KV cache.
+    """
+    params = dict(params)
+    system = params.pop("system", None)
+    if chat:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": stream, **params}
+    else:
+        payload = {"model": model, "prompt": prompt, "stream": stream, **params}
+        if system:
+            payload["system"] = system
+    if keep_alive is not None:
+        payload.setdefault("keep_alive", keep_alive)
+    return payload
+
+
+def prompt_eval_summary(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Average prompt evaluation over a series of `last_stats`, to compare prompt layouts"""
+    stats = [s for s in stats if "prompt_eval_count" in s]
+    if not stats:
+        return {"calls": 0}
+    return {
+        "calls": len(stats),
+        "avg_prompt_eval_count": sum(s["prompt_eval_count"] for s in stats) / len(stats),
+        "avg_prompt_eval_ms": sum(s.get("prompt_eval_duration", 0) for s in stats) / len(stats) / 1e6,
+    }
+
+
+def response_text(data: Dict[str, Any]) -> str:
+    # /api/chat nests the text in "message", /api/generate has it in "response"
+    if "message" in data:
+        return data["message"].get("content", "")
+    return data.get("response", "")
+
+
 
 
 class OllamaLLM(LLMInterface):
@@ -15,21 +65,81 @@ class OllamaLLM(LLMInterface):
     Args:
     base_url: e.g. "http://localhost:11434" (no trailing slash)
     model: e.g. "llama3:8b" or any installed model tag
+    keep_alive: how long Ollama keeps the model loaded after a call (e.g. "10m", -1 = forever, None = server default)
+    connect_timeout / read_timeout: seconds, per request
+    retries / backoff: retries on connection errors and 429/502/503/504, with exponential backoff
+    pool_size: max pooled keep-alive connections to the server
+    chat: use /api/chat instead of /api/generate
+
+    Calls go through one persistent session, so back-to-back calls reuse the
+    TCP connection. `last_stats` holds Ollama's timings for the calling
+    thread's latest call (load_duration shows whether the model had to be
+    reloaded, a low prompt_eval_count that the server reused a cached prompt
+    prefix); summaries run on background threads through the same client
+    don't overwrite a reply's stats.
+
+    `options["system"]` is sent as the system prompt rather than generation
+    options; callers put the stable part of their prompt there.
     """
 
 
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3", **defaults: Any) -> None:
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3", *,
+                 keep_alive: Optional[str | int] = "10m", connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 retries: int = 3, backoff: float = 0.5, pool_size: int = 4, chat: bool = False,
+                 **defaults: Any) -> None:
         self.base_url = base_url.rstrip("/")
         self.model = model
+        self.keep_alive = keep_alive
+        self.chat = chat
+        self.url = f"{self.base_url}/api/chat" if chat else f"{self.base_url}/api/generate"
+        self.timeout = (connect_timeout, read_timeout)
         self.defaults: Dict[str, Any] = {"temperature": 0.2, **defaults}
+        self._local = threading.local()
+
+        # read errors are not retried: the request may already be generating
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 502, 503, 504), allowed_methods=frozenset({"POST"}),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+
+    @property
+    def last_stats(self) -> Dict[str, Any]:
+        return getattr(self._local, "stats", {})
+
+
+    def _payload(self, prompt: str, stream: bool, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return ollama_payload(self.model, prompt, stream, self.chat, self.keep_alive, {**self.defaults, **(options or {})})
 
 
     def generate(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> str:
-        url = f"{self.base_url}/api/generate"
-        payload: Dict[str, Any] = {"model": self.model, "prompt": prompt, **self.defaults, **(options or {})}
-        r = requests.post(url, json=payload, timeout=120)
+        r = self.session.post(self.url, json=self._payload(prompt, False, options), timeout=self.timeout)
         r.raise_for_status()
-        # Ollama /api/generate streams by lines; when not streaming, response has 'response'
+        # Ollama streams by lines; when not streaming, one object holds the whole response
         data = r.json()
-        text = data.get("response", "")
-        return text.strip()
\ No newline at end of file
+        self._local.stats = {k: data[k] for k in STAT_KEYS if k in data}
+        text = response_text(data)
+        return text.strip()
+
+
+    def stream(self, prompt: str, *, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        with self.session.post(self.url, json=self._payload(prompt, True, options), timeout=self.timeout, stream=True) as r:
+            r.raise_for_status()
+            # one JSON object per line, the last one has done=true
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                chunk = response_text(data)
+                if chunk:
+                    yield chunk
+                if data.get("done"):
+                    self._local.stats = {k: data[k] for k in STAT_KEYS if k in data}
+                    break
+
+
+    def close(self) -> None:
+        self.session.close()
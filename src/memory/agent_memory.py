@@ -3,13 +3,26 @@ from typing import Tuple, List, Dict
 from dataclasses import dataclass, field
 from collections import deque
 from datetime import datetime, timedelta
+import threading
+import warnings
 
 from src.core.memory_interface import MemoryInterface, SnapShot, Turn
 from src.core.llm_interface import LLMInterface
+from src.engine.context_builder import memory_block
 from src.utils.prompting import SUMMARY_SYSTEM_PROMPT
 from src.storage.chapter_storage import ChapterStorage
 from src.storage.json_storage import RecentStorage
 from src.memory.aggregator import Aggregator
+from src.memory.worker import MemoryWorker
+
+
+# evicted turns kept for another fold attempt after summarization fails; older ones are dropped
+MAX_UNFOLDED_TURNS = 50
+
+
+def _approx_tokens(text: str) -> int:
+    # ~4 characters per token is close enough to size a summarization batch
+    return len(text) // 4 + 1
 
 @dataclass
 class AgentMemory(MemoryInterface):
@@ -18,6 +31,10 @@ class AgentMemory(MemoryInterface):
     - Keeps a rolling buffer of turns (recent + fading summary)
     - Every `window_minutes`, takes a snapshot of the *current rolling summary*
     - Snapshots later can be aggregated into hour/day summaries
+    - With `background`, summarization/snapshot/chapter work runs on a
+      MemoryWorker so add_turn returns without waiting on the LLM
+    - Evicted turns are folded into the summary `summarize_batch` at a time
+      (or sooner once they reach `summarize_token_budget`), one LLM call per batch
     """
 
     llm: LLMInterface
@@ -27,10 +44,18 @@ class AgentMemory(MemoryInterface):
     snap_counter: int = 10
     chap_counter:int = 10
     max_recent: int = 5
+    background: bool = True
+    summarize_batch: int = 1
+    summarize_token_budget: int | None = None
     _turn_counter: int = 0
     _turns: deque[Turn] =  field(init=False) # load from recent_store
     _rolling_snapshot: SnapShot|None = None # load from recent store
     _snapshots: List[SnapShot] =  field(default_factory=list)  # list of {time, summary}
+    _pending: deque[Turn] = field(init=False) # evicted turns not yet folded into the summary
+    _batch: List[Turn] = field(default_factory=list) # evicted turns not yet handed to a fold job
+    _unfolded: List[Turn] = field(default_factory=list) # turns of failed folds, retried with the next batch
+    _lock: threading.Lock = field(init=False)
+    _worker: MemoryWorker | None = field(init=False, default=None)
     #_last_window: datetime = field(default_factory=datetime.now)
     
     def __post_init__(self):
@@ -38,48 +63,107 @@ class AgentMemory(MemoryInterface):
         self._turns = self.recent_store.load_turns()
         # load rolling snapshot from storage
         self._rolling_snapshot = self.recent_store.load_snapshot()
+        self._pending = deque()
+        self._lock = threading.Lock()
+        if self.background:
+            self._worker = MemoryWorker()
 
     def add_turn(self, user: str, ai: str) -> None:
         now = datetime.now()
-        self._turns.append(Turn(time =now, user=user, ai=ai))
-        self._turn_counter+=1
-        # rolling summarization: fade oldest turn into summary
-        if len(self._turns) > self.max_recent:
-            oldest = self._turns.popleft()
-            self._rolling_snapshot = self._summarize_incremental(oldest)
-
-        # check if snapshot window passed
-        if self._turn_counter==self.snap_counter:
-            self._create_snapshot()
-            self._turn_counter=0
-            if self._rolling_snapshot:
-                self.recent_store.save_rolling_snapshot(self._rolling_snapshot)
-        
+        turn = Turn(time =now, user=user, ai=ai)
+        with self._lock:
+            self._turns.append(turn)
+            self._turn_counter+=1
+            # rolling summarization: fade oldest turns into summary, a batch at a time
+            batch = None
+            if len(self._turns) > self.max_recent:
+                oldest = self._turns.popleft()
+                self._pending.append(oldest)
+                self._batch.append(oldest)
+                if self._batch_full():
+                    batch, self._batch = self._batch, []
+
+            # check if snapshot window passed
+            snapshot_due = self._turn_counter==self.snap_counter
+            if snapshot_due:
+                self._turn_counter=0
+
+        self.recent_store.save_turn(turn)
+
+        # jobs run in order, so a snapshot sees every batch folded before it
+        if batch:
+            self._run(lambda: self._fold_turns(batch))
+        if snapshot_due:
+            self._run(self._snapshot_job)
+
+    def _run(self, job) -> None:
+        if self._worker:
+            self._worker.submit(job)
+        else:
+            job()
+
+    def _batch_full(self) -> bool:
+        if len(self._batch) >= self.summarize_batch:
+            return True
+        if self.summarize_token_budget is None:
+            return False
+        tokens = sum(_approx_tokens(t.user) + _approx_tokens(t.ai) for t in self._batch)
+        return tokens >= self.summarize_token_budget
+
+    def _fold_turns(self, turns: List[Turn]) -> None:
+        # folds run in order, so earlier failed turns are the oldest in _pending
+        with self._lock:
+            turns, self._unfolded = self._unfolded + turns, []
+        if not turns:
+            return
+        folded = False
+        try:
+            snapshot = self._summarize_incremental(turns)
+            folded = True
+        finally:
+            with self._lock:
+                if folded:
+                    self._rolling_snapshot = snapshot
+                    done = len(turns)
+                else:
+                    # keep them for the next fold, up to a limit
+                    done = max(len(turns) - MAX_UNFOLDED_TURNS, 0)
+                    self._unfolded = turns[done:]
+                for _ in range(done):
+                    self._pending.popleft()
+            if not folded and done:
+                warnings.warn(f"summarization failed, dropped {done} turns that were never folded into the summary")
+
+    def _snapshot_job(self) -> None:
+        self._create_snapshot()
+        self._save_rolling_snapshot()
+
         if len(self._snapshots)==self.chap_counter:
             self._create_chapter()
-            
-        self.recent_store.save_turn(self._turns[-1])
-        
 
-    def _summarize_incremental(self, turn: Turn) -> SnapShot:
-        """Update rolling summary with a single old turn"""
-        transcript = f"[{turn.time.strftime("%Y-%m-%d %H:%M:%S")}]\nUser: {turn.user}\nAI: {turn.ai}"
+    def _summarize_incremental(self, turns: List[Turn]) -> SnapShot:
+        """Update rolling summary with a batch of old turns in one LLM call"""
+        transcript = "\n\n".join(
+            [f"[{turn.time.strftime("%Y-%m-%d %H:%M:%S")}]\nUser: {turn.user}\nAI: {turn.ai}" for turn in turns]
+        )
+        heading = "New Turn" if len(turns) == 1 else "New Turns"
         prompt=""
         if self._rolling_snapshot:
             prompt = (
                 f"{SUMMARY_SYSTEM_PROMPT}\n\n"
                 f"Existing Summary:\n{self._rolling_snapshot.summary}\n\n"
-                f"New Turn:\n{transcript}\n\n"
+                f"{heading}:\n{transcript}\n\n"
                 f"Update the memory summary now:"
             )
         else:
             prompt = (
                 f"{SUMMARY_SYSTEM_PROMPT}\n\n"
-                f"New Turn:\n{transcript}\n\n"
+                f"{heading}:\n{transcript}\n\n"
                 f"Update the memory summary now:"
             )
         summary =  self.llm.generate(prompt).strip()
-        return SnapShot(day=turn.time, summary=summary)
+        # stamped with the newest folded turn, as when folding one at a time
+        return SnapShot(day=turns[-1].time, summary=summary)
 
     def _create_snapshot(self) -> None:
         """Freeze current rolling summary into a time-stamped snapshot"""
@@ -87,20 +171,19 @@ class AgentMemory(MemoryInterface):
             return
         self._snapshots.append(self._rolling_snapshot)
 
-    def get_context(self) -> str:
-        """Get recent context"""
+    def context_sections(self) -> Tuple[str | None, List[str]]:
+        """Rolling summary and formatted recent turns (oldest first), for budgeted prompts"""
         k_recent = self.max_recent
-        recent = list(self._turns)[-k_recent:]
-        recent_txt = "\n".join(
-            [f"[{t.time.strftime("%Y-%m-%d %H:%M")}]\nUser: {t.user}\nAI: {t.ai}" for t in recent]
-        )
+        with self._lock:
+            # turns still waiting for summarization stay visible until folded in
+            recent = list(self._pending) + list(self._turns)[-k_recent:]
+            rolling_snapshot = self._rolling_snapshot
+        recent_txt = [f"[{t.time.strftime("%Y-%m-%d %H:%M")}]\nUser: {t.user}\nAI: {t.ai}" for t in recent]
+        return (rolling_snapshot.summary if rolling_snapshot else None), recent_txt
 
-        parts = []
-        if self._rolling_snapshot:
-            parts.append(f"[ROLLING SUMMARY]\n{self._rolling_snapshot.summary}")
-        if recent:
-            parts.append(f"[RECENT TURNS]\n{recent_txt}")
-        return "\n\n".join(parts) if parts else ""
+    def get_context(self) -> str:
+        """Get recent context"""
+        return memory_block(*self.context_sections())
     
     def _create_chapter(self):
         prev_chapter = self.chapter_store.get_last_chapter()
@@ -116,3 +199,25 @@ class AgentMemory(MemoryInterface):
 
     def all_turns(self) -> List[Tuple[str, str]]:
         return [(t.user, t.ai) for t in self._turns]
+
+    def flush(self) -> None:
+        """Fold any partial summarization batch and wait for queued maintenance to finish"""
+        with self._lock:
+            batch, self._batch = self._batch, []
+            retry = bool(self._unfolded)
+        if batch or retry:
+            self._run(lambda: self._fold_turns(batch))
+            self._run(self._save_rolling_snapshot)
+        if self._worker:
+            self._worker.join()
+
+    def _save_rolling_snapshot(self) -> None:
+        if self._rolling_snapshot:
+            self.recent_store.save_rolling_snapshot(self._rolling_snapshot)
+
+    def close(self) -> None:
+        """Finish queued memory maintenance and stop the worker"""
+        self.flush()
+        if self._worker:
+            self._worker.close()
+            self._worker = None
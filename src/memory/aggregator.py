@@ -1,24 +1,23 @@
 from dataclasses import dataclass
 from datetime import date
-from typing import List
+from typing import List, Optional
 from src.core.llm_interface import LLMInterface
 from src.utils.prompting import CHAPTER_SYSTEM_PROMPT, DAILY_SYSTEM_PROMPT
 from src.core.memory_interface import Chapter, SnapShot, DailyMemory
 from src.storage.daily_storage import DailyMemoryStorage
 from src.storage.chapter_storage import ChapterStorage
-import threading
-import datetime
 
 class Aggregator:
+    """Merges snapshots into chapters and a day's chapters into its daily memory.
+
+    Daily rollups are driven by a RollupScheduler (src/memory/rollup_scheduler.py).
+    """
     def __init__(self, llm: LLMInterface, chapter_store: ChapterStorage, daily_store: DailyMemoryStorage):
         self.llm = llm
         # self._hourly: dict[str, str] = {}
         # self._daily: dict[str, str] = {}
         self.daily_store = daily_store
         self.chapter_store = chapter_store
-        t = threading.Thread(target=self._daily_rollup, daemon=True)
-
-        t.start()
 
     # ... existing methods ...
 
@@ -70,36 +69,32 @@ class Aggregator:
 
         return Chapter(day=new_date, memory=merged_memory, tags=tags)
 
-    def _daily_rollup(self):
-        """Roll up last active day's chapters into a daily memory block."""
-        today = datetime.date.today()
+    def rollup_day(self, day: date, today: Optional[date] = None) -> Optional[DailyMemory]:
+        """Roll up a finished day's chapters into a daily memory block.
 
-        # last saved chapter find karo
-        last_chapter = self.chapter_store.get_last_chapter()
-        if not last_chapter:
-            return
-
-        last_active_day = last_chapter.day
-        if last_active_day == today:
-            return  # current day ko abhi roll-up mat karo
+        `today` (default: date.today()) decides which days are finished.
+        """
+        if day >= (today or date.today()):
+            return None  # current day ko abhi roll-up mat karo
 
         # check agar daily memory already saved hai us din ke liye
-        if self.daily_store.get_by_date(last_active_day):
-            return  # already summarized
+        if self.daily_store.get_by_date(day):
+            return None  # already summarized
 
-        # fetch all chapters from last active day
-        chapters: List[Chapter] = self.chapter_store.retrieve_by_day(last_active_day)
+        # fetch all chapters from that day
+        chapters: List[Chapter] = self.chapter_store.retrieve_by_day(day)
         if not chapters:
-            return
+            return None
 
         merged = "\n".join([c.memory for c in chapters])
         prompt = (
             f"{DAILY_SYSTEM_PROMPT}\n\n"
-            f"Chapters for {last_active_day.isoformat()}:\n{merged}\n\n"
+            f"Chapters for {day.isoformat()}:\n{merged}\n\n"
             "Create a single daily memory capturing key events, decisions, preferences, and [ONGOING] items."
         )
         day_memory = self.llm.generate(prompt).strip()
 
         # save as daily memory (SQL table)
-        daily_mem = DailyMemory(day=last_active_day, memory=day_memory, tags=["daily-summary"])
-        self.daily_store.save(daily_mem)
\ No newline at end of file
+        daily_mem = DailyMemory(day=day, memory=day_memory, tags=["daily-summary"])
+        self.daily_store.save(daily_mem)
+        return daily_mem
\ No newline at end of file
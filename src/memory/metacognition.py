@@ -1,51 +1,200 @@
 import json
+from concurrent.futures import Executor, Future
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
 from src.core.llm_interface import LLMInterface
+from src.memory.router import CHITCHAT, VAGUE_TIME, FastRouter, parse_dates
 from src.storage.chapter_storage import ChapterStorage
 from src.storage.daily_storage import DailyMemoryStorage
 from src.utils.prompting import META_COGNITION_SYSTEM_PROMPT
 
+# chapters returned by the semantic strategies
+TOP_K = 5
+# days the "period" strategy narrows chapter search to
+TOP_DAYS = 3
+
+
+def _as_date(value) -> Optional[date]:
+    # decisions carry ISO strings (LLM JSON / router); tolerate date objects too
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Speculation:
+    """Retrievals started on the raw user message before the decision is known.
+
+    Holds futures keyed by the (strategy, params) they answer; `take` hands
+    out the one matching a decision and cancels the others. `query_emb` is
+    the message's embedding, computed once for the searches and the router.
+    """
+
+    def __init__(self, futures: Dict[tuple, Future], query_emb: Optional[Future] = None):
+        self.futures = futures
+        self.query_emb = query_emb
+
+    def take(self, key: tuple) -> Optional[Future]:
+        future = self.futures.pop(key, None)
+        self.cancel()
+        return future
+
+    def cancel(self) -> None:
+        # running searches can't be interrupted, their results are dropped
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+
 class MetaCognition:
-    def __init__(self, llm: LLMInterface, chapter_store:ChapterStorage, daily_store:DailyMemoryStorage):
+    """Decides how to retrieve for a message and runs the retrieval.
+
+    With `lexical` the "semantic" and "hybrid" strategies search chapters with
+    `ChapterStorage.hybrid_search` (BM25 + dense, fused); without it they are
+    dense only. The "period" strategy searches coarse to fine: it ranks days
+    by their daily memory, then searches only those days' chapters.
+    """
+
+    def __init__(self, llm: LLMInterface, chapter_store:ChapterStorage, daily_store:DailyMemoryStorage,
+                 router: Optional[FastRouter] = None, lexical: bool = True):
         self.llm = llm
         self.chapter_store = chapter_store
         self.daily_store = daily_store
+        self.router = router
+        self.lexical = lexical
+
+    def _search(self, query: str, query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        if self.lexical:
+            return self.chapter_store.hybrid_search(query, top_k=TOP_K, query_emb=query_emb)
+        return self.chapter_store.semantic_retrieve_global(query, top_k=TOP_K, query_emb=query_emb)
 
-    def analyze(self, user_msg: str, context:str):
+    def _search_range(self, query: str, start: date, end: date, query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        if self.lexical:
+            return self.chapter_store.hybrid_search(query, top_k=TOP_K, start=start, end=end, query_emb=query_emb)
+        return self.chapter_store.semantic_retrieve_range(query, top_k=TOP_K, start=start, end=end, query_emb=query_emb)
+
+    def _search_period(self, query: str, query_emb: Optional[np.ndarray] = None) -> list:
+        """Chapters of the days whose daily memory best matches `query`, then those daily memories"""
+        days = self.daily_store.semantic_days(query, top_k=TOP_DAYS)
+        if not days:
+            # nothing rolled up (or embedded) yet, search all chapters
+            return self._search(query, query_emb)
+        day_list = [h["daily"].day for h in days]
+        if self.lexical:
+            chapters = self.chapter_store.hybrid_search(query, top_k=TOP_K, days=day_list, query_emb=query_emb)
+        else:
+            chapters = self.chapter_store.semantic_retrieve_days(query, day_list, top_k=TOP_K, query_emb=query_emb)
+        return chapters + [h["daily"] for h in days]
+
+    def analyze(self, user_msg: str, context:str, speculation: Optional[Speculation] = None):
         """
         Decide retrieval strategy.
         Returns dict like:
-        { "strategy": "semantic"|"day"|"hybrid"|"none", "params": {...} }
+        { "strategy": "semantic"|"day"|"hybrid"|"period"|"none", "params": {...} }
         """
-        # Prompt to LLM for retrieval decision
-        analysis_prompt = f"""{META_COGNITION_SYSTEM_PROMPT}
+        decision = self.route(user_msg, context, speculation.query_emb if speculation else None)
+        if decision is not None:
+            return decision
+        return self._llm_analyze(user_msg, context)
+
+    def _llm_analyze(self, user_msg: str, context: str) -> dict:
+        decision = self.llm.generate(self.analysis_prompt(user_msg, context))
+        return self.parse_decision(decision)
+
+    def route(self, user_msg: str, context: str, query_emb: Optional[Future] = None) -> Optional[dict]:
+        """Local decision from the fast router, or None when the LLM has to decide.
+
+        `query_emb` is the speculation's embedding of the message, if any.
+        """
+        if self.router is None:
+            return None
+        decision = self.router.route(user_msg, query_emb)
+        if decision is not None:
+            self.router.maybe_shadow(decision, lambda: self._llm_analyze(user_msg, context))
+        return decision
+
+    def speculate(self, user_msg: str, executor: Executor) -> Optional[Speculation]:
+        """Start the retrievals a decision on `user_msg` is likely to ask for.
+
+        Semantic search on the raw message always; if the message names dates,
+        also their daily memories and the chapters of that range, and if it
+        only hints at a time, the coarse-to-fine period search.
+        """
+        text = user_msg.strip()
+        if not text or CHITCHAT.match(text):
+            return None
+        # encoded once, submitted first so it is picked up before the searches waiting on it
+        emb = executor.submit(self.chapter_store.encode_query, text)
+        futures = {("semantic", text): executor.submit(lambda: self._search(text, emb.result()))}
+        dates = parse_dates(text, date.today())
+        if dates:
+            start, end = dates
+            futures[("day", start, end)] = executor.submit(self.daily_store.get_range, start, end)
+            futures[("hybrid", start, end, text)] = executor.submit(
+                lambda: self._search_range(text, start, end, emb.result()))
+        elif VAGUE_TIME.search(text):
+            futures[("period", text)] = executor.submit(lambda: self._search_period(text, emb.result()))
+        return Speculation(futures, emb)
+
+    def analysis_prompt(self, user_msg: str, context: str) -> str:
+        """Prompt to LLM for retrieval decision"""
+        return f"""{META_COGNITION_SYSTEM_PROMPT}
 
 User: {user_msg}
 {context}
 """
-        decision = self.llm.generate(analysis_prompt)
+
+    def parse_decision(self, decision: str) -> dict:
         try:
             return json.loads(decision)
         except:
             return {"strategy": "none"}
         
-    def retrieve(self, decision):
+    def retrieve(self, decision, speculation: Optional[Speculation] = None):
+        """Run the decided retrieval, reusing a matching speculative one if given"""
         strategy = decision.get("strategy", "none")
         params = decision.get("params", {})
+        query = params.get("query")
+        if isinstance(query, str):
+            query = query.strip()
+        start = _as_date(params.get("start_day"))
+        end = _as_date(params.get("end_day")) or start
+
+        if speculation is not None:
+            if strategy == "semantic":
+                key = ("semantic", query)
+            elif strategy == "day":
+                key = ("day", start, end)
+            elif strategy == "hybrid":
+                key = ("hybrid", start, end, query)
+            elif strategy == "period":
+                key = ("period", query)
+            else:
+                key = None
+            future = speculation.take(key)
+            if future is not None:
+                return future.result()
 
         if strategy == "semantic":
-            query = params.get("query")
-            return self.chapter_store.semantic_retrieve_global(query, top_k=5)
+            return self._search(query)
 
         if strategy == "day":
-            start = params.get("start_day")
-            end = params.get("end_day", start)
+            if start is None:
+                return []
             return self.daily_store.get_range(start, end)
 
         if strategy == "hybrid":
-            start = params.get("start_day")
-            end = params.get("end_day", start)
-            query = params.get("query")
-            return self.chapter_store.semantic_retrieve_range(query, top_k=5, start=start,end=end)
+            if start is None:
+                return []
+            return self._search_range(query, start, end)
+
+        if strategy == "period":
+            if not query:
+                return []
+            return self._search_period(query)
 
         return []
 
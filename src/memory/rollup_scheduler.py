@@ -0,0 +1,142 @@
+from __future__ import annotations
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from src.memory.aggregator import Aggregator
+
+
+class RollupScheduler:
+    """Builds the daily memory of every finished day that has chapters but none yet.
+
+    A scan runs at start, again after each midnight while the process is up
+    (checked at least every `check_interval` seconds), and whenever
+    `trigger()` is called. Missing days are rolled up oldest first on at most
+    `max_workers` threads. `metrics()` reports progress and per-day latency;
+    `close()` stops scanning, drops queued days and waits for running ones.
+    """
+
+    def __init__(self, aggr: Aggregator, max_workers: int = 2, check_interval: float = 300.0,
+                 today: Callable[[], date] = date.today):
+        self.aggr = aggr
+        self.check_interval = check_interval
+        self.today = today
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rollup")
+        self._lock = threading.Lock()
+        self._inflight: Set[date] = set()
+        self._failed: Set[date] = set()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._stats: Dict[str, float] = {"scans": 0, "queued": 0, "done": 0, "skipped": 0, "failed": 0,
+                                         "total_seconds": 0.0, "max_seconds": 0.0}
+        self._last_scan: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._loop, name="rollup-scheduler", daemon=True)
+
+    def start(self) -> "RollupScheduler":
+        self._thread.start()
+        return self
+
+    def trigger(self) -> None:
+        """Scan for missing days now"""
+        self._wake.set()
+
+    def _loop(self) -> None:
+        day = None
+        while not self._stop.is_set():
+            today = self.today()
+            if today != day or self._wake.is_set():
+                # a new day: yesterday can be rolled up, and days that failed get another try
+                if today != day:
+                    with self._lock:
+                        self._failed.clear()
+                self._wake.clear()
+                day = today
+                self.backfill()
+            midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+            wait = min(self.check_interval, max((midnight - datetime.now()).total_seconds(), 0) + 1)
+            self._wake.wait(wait)
+
+    def missing_days(self) -> list:
+        """Finished days with chapters but no daily memory, oldest first"""
+        today = self.today()
+        done = set(self.aggr.daily_store.days())
+        return [d for d in self.aggr.chapter_store.chapter_days() if d < today and d not in done]
+
+    def backfill(self) -> int:
+        """Queue every missing day not already queued or failed today; returns how many were queued"""
+        try:
+            missing = self.missing_days()
+        except Exception:
+            traceback.print_exc()
+            return 0
+        with self._lock:
+            self._stats["scans"] += 1
+            self._last_scan = time.time()
+            todo = [d for d in missing if d not in self._inflight and d not in self._failed]
+            self._inflight.update(todo)
+            self._stats["queued"] += len(todo)
+        for d in todo:
+            try:
+                self._pool.submit(self._run, d)
+            except RuntimeError:
+                # pool shut down by close()
+                with self._lock:
+                    self._inflight.discard(d)
+        return len(todo)
+
+    def _run(self, day: date) -> None:
+        if self._stop.is_set():
+            with self._lock:
+                self._inflight.discard(day)
+            return
+        t0 = time.perf_counter()
+        try:
+            result = self.aggr.rollup_day(day, today=self.today())
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                self._stats["failed"] += 1
+                self._failed.add(day)
+                self._last_error = f"{day.isoformat()}: {e}"
+            return
+        finally:
+            with self._lock:
+                self._inflight.discard(day)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            if result is None:
+                self._stats["skipped"] += 1
+                return
+            self._stats["done"] += 1
+            self._stats["total_seconds"] += elapsed
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            done = self._stats["done"]
+            return {
+                "scans": int(self._stats["scans"]),
+                "queued": int(self._stats["queued"]),
+                "pending": len(self._inflight),
+                "done": int(done),
+                "skipped": int(self._stats["skipped"]),
+                "failed": int(self._stats["failed"]),
+                "avg_seconds": self._stats["total_seconds"] / done if done else None,
+                "max_seconds": self._stats["max_seconds"] if done else None,
+                "last_scan": self._last_scan,
+                "last_error": self._last_error,
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        # queued days are dropped, a rollup already talking to the LLM is finished
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._inflight.clear()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import random
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from src.storage.chapter_storage import ChapterStorage
+
+# messages that never need retrieval
+CHITCHAT = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ty|ok|okay|k|cool|great|nice|awesome|perfect|got it|"
+    r"bye|goodbye|good (morning|night|evening|afternoon)|lol|haha|yes|yep|no|nope|sure)"
+    r"( (so much|a lot|again|there))?[\s!.?]*$",
+    re.IGNORECASE,
+)
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+DAYS_AGO = re.compile(r"\b(\d+) days? ago\b", re.IGNORECASE)
+LAST_N_DAYS = re.compile(r"\b(?:last|past) (\d+) days\b", re.IGNORECASE)
+WEEKDAY = re.compile(r"\b(?:on|last) (monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.IGNORECASE)
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+# time references too vague to turn into dates ("that trip last spring", "a few months ago")
+VAGUE_TIME = re.compile(
+    r"\b(?:last|that|this past) (?:spring|summer|fall|autumn|winter|year|time)\b|"
+    r"\b(?:a while|some time|a few (?:weeks|months|years)|weeks|months|years|ages) ago\b|"
+    r"\bback (?:when|then|in the day)\b|\bremember when\b|\bthat (?:trip|day|weekend|week|night)\b",
+    re.IGNORECASE,
+)
+# phrasings dateparser is allowed to look at, so plain words like "may" or "march on" don't become dates
+DATE_HINT = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2}\b|\b\d{1,2}/\d{1,2}(/\d{2,4})?\b", re.IGNORECASE)
+
+
+_search_dates = None
+
+
+def _dateparser():
+    """dateparser's search_dates, imported on first need (it is slow to import); None if not installed"""
+    global _search_dates
+    if _search_dates is None:
+        try:
+            from dateparser.search import search_dates  # type: ignore
+        except Exception:  # pragma: no cover
+            search_dates = False  # optional, regexes cover the common phrasings
+        _search_dates = search_dates
+    return _search_dates or None
+
+
+def parse_dates(text: str, today: date) -> Optional[Tuple[date, date]]:
+    """Explicit date or date range mentioned in `text`, if any."""
+    iso = []
+    for m in ISO_DATE.findall(text):
+        try:
+            iso.append(date.fromisoformat(m))
+        except ValueError:
+            continue
+    if iso:
+        return min(iso), max(iso)
+
+    lower = text.lower()
+    if "day before yesterday" in lower:
+        d = today - timedelta(days=2)
+        return d, d
+    if "yesterday" in lower:
+        d = today - timedelta(days=1)
+        return d, d
+    if re.search(r"\btoday\b", lower):
+        return today, today
+    if m := DAYS_AGO.search(text):
+        d = today - timedelta(days=int(m.group(1)))
+        return d, d
+    if m := LAST_N_DAYS.search(text):
+        return today - timedelta(days=int(m.group(1))), today
+    if "last week" in lower:
+        monday = today - timedelta(days=today.weekday() + 7)
+        return monday, monday + timedelta(days=6)
+    if "this week" in lower:
+        return today - timedelta(days=today.weekday()), today
+    if "last month" in lower:
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    if "this month" in lower:
+        return today.replace(day=1), today
+    if m := WEEKDAY.search(text):
+        back = (today.weekday() - WEEKDAYS.index(m.group(1).lower())) % 7 or 7
+        d = today - timedelta(days=back)
+        return d, d
+
+    search_dates = _dateparser() if DATE_HINT.search(text) else None
+    if search_dates is not None:
+        base = datetime.combine(today, datetime.min.time())
+        found = search_dates(text, languages=["en"], settings={"PREFER_DATES_FROM": "past", "RELATIVE_BASE": base})
+        if found:
+            days = [d.date() for _, d in found]
+            return min(days), max(days)
+    return None
+
+
+class FastRouter:
+    """Local pre-router in front of the metacognition LLM call.
+
+    Decides `none` for chit-chat, `day` for explicit dates, `period` for
+    vague time references without dates, `semantic` when the message is
+    close to a stored chapter (embedding similarity against the chapter
+    index) and `hybrid` when dates and topic apply; anything else returns
+    None and falls back to the LLM. With `shadow_rate` > 0 that share of
+    local decisions is also sent to the LLM in the background and compared,
+    which is what `report()["agreement"]` measures.
+    """
+
+    def __init__(self, chapter_store: ChapterStorage, topical_threshold: float = 0.45,
+                 shadow_rate: float = 0.0, today: Callable[[], date] = date.today):
+        self.chapter_store = chapter_store
+        self.topical_threshold = topical_threshold
+        self.shadow_rate = shadow_rate
+        self.today = today
+        self._lock = threading.Lock()
+        self._routed: Counter = Counter()
+        self._fallbacks = 0
+        self._shadowed = 0
+        self._agreed = 0
+
+    def _topical(self, text: str, query_emb: Optional[Future]) -> bool:
+        emb = query_emb.result() if query_emb is not None else None
+        hits = self.chapter_store.semantic_retrieve_global(text, top_k=1, query_emb=emb)
+        return bool(hits) and hits[0]["score"] >= self.topical_threshold
+
+    def route(self, user_msg: str, query_emb: Optional[Future] = None) -> Optional[dict]:
+        """Retrieval decision in the metacognition schema, or None to ask the LLM.
+
+        `query_emb` resolves to the message's embedding when it is already being
+        computed (the speculative retrievals'), so it isn't encoded twice.
+        """
+        decision = self._decide(user_msg.strip(), query_emb)
+        with self._lock:
+            if decision is None:
+                self._fallbacks += 1
+            else:
+                self._routed[decision["strategy"]] += 1
+        return decision
+
+    def _decide(self, text: str, query_emb: Optional[Future]) -> Optional[dict]:
+        if not text or CHITCHAT.match(text):
+            return {"strategy": "none", "params": {}}
+
+        today = self.today()
+        dates = parse_dates(text, today)
+        if dates:
+            start, end = (d.isoformat() for d in dates)
+            # the current day has no daily memory yet, only its chapters can answer
+            if dates[1] >= today or self._topical(text, query_emb):
+                return {"strategy": "hybrid", "params": {"start_day": start, "end_day": end, "query": text}}
+            return {"strategy": "day", "params": {"start_day": start, "end_day": end}}
+        if VAGUE_TIME.search(text):
+            return {"strategy": "period", "params": {"query": text}}
+        if self._topical(text, query_emb):
+            return {"strategy": "semantic", "params": {"query": text}}
+        return None
+
+    def maybe_shadow(self, decision: dict, llm_decide: Callable[[], dict]) -> None:
+        """Compare a local decision against the LLM's on a sample of turns, off the reply path"""
+        if self.shadow_rate <= 0 or random.random() >= self.shadow_rate:
+            return
+
+        def compare():
+            agreed = llm_decide().get("strategy", "none") == decision["strategy"]
+            with self._lock:
+                self._shadowed += 1
+                self._agreed += agreed
+
+        threading.Thread(target=compare, daemon=True).start()
+
+    def report(self) -> dict:
+        with self._lock:
+            routed = sum(self._routed.values())
+            total = routed + self._fallbacks
+            return {
+                "decisions": total,
+                "bypassed": routed,
+                "bypass_rate": routed / total if total else 0.0,
+                "by_strategy": dict(self._routed),
+                "shadowed": self._shadowed,
+                "agreement": self._agreed / self._shadowed if self._shadowed else None,
+            }
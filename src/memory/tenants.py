@@ -0,0 +1,235 @@
+from __future__ import annotations
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+from src.core.embedding_interface import Embedder
+from src.core.llm_interface import LLMInterface
+from src.embeddings.factory import make_embedder
+from src.memory.agent_memory import AgentMemory
+from src.memory.aggregator import Aggregator
+from src.memory.metacognition import MetaCognition
+from src.memory.rollup_scheduler import RollupScheduler
+from src.memory.router import FastRouter
+from src.storage.chapter_storage import ChapterStorage
+from src.storage.daily_storage import DailyMemoryStorage
+from src.storage.json_storage import RecentStorage
+
+# user ids become directory names
+USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass
+class Partition:
+    """One user's memory: stores plus the memory/aggregator/metacognition over them."""
+
+    user_id: str
+    chapter_store: ChapterStorage
+    daily_store: DailyMemoryStorage
+    recent_store: RecentStorage
+    aggr: Aggregator
+    memory: AgentMemory
+    meta: MetaCognition
+    rollups: RollupScheduler
+    engine: Any = None  # front-end engine bound to this partition, set by the caller
+    last_used: float = field(default_factory=time.monotonic)
+    _refs: int = 0
+
+    def close(self) -> None:
+        # stop rollups and drain memory maintenance first, they still write to the stores
+        self.rollups.close()
+        self.memory.close()
+        self.recent_store.close()
+        self.chapter_store.close()
+        self.daily_store.close()
+
+
+def open_partition(directory: str, llm: LLMInterface, *, user_id: str = "",
+                   embedder: Optional[Embedder] = None,
+                   chapter_options: Optional[Dict[str, Any]] = None,
+                   memory_options: Optional[Dict[str, Any]] = None,
+                   fast_router: bool = True, router_shadow_rate: float = 0.0, lexical: bool = True,
+                   rollup_workers: int = 2) -> Partition:
+    """Open the memory stored in `directory` (chapters.db, chapters.faiss, memory.db, recent.json).
+
+    `fast_router` puts a FastRouter in front of the metacognition LLM call, which
+    double-checks `router_shadow_rate` of its decisions with the LLM to measure agreement;
+    `lexical` fuses full-text (BM25) results into chapter searches;
+    missing daily memories are built by a RollupScheduler with `rollup_workers` threads.
+    """
+    os.makedirs(directory, exist_ok=True)
+    chapter_store = ChapterStorage(os.path.join(directory, "chapters.db"), os.path.join(directory, "chapters.faiss"),
+                                   embedder=embedder, **(chapter_options or {}))
+    # daily memories are embedded in the chapters' vector space for coarse-to-fine search
+    daily_store = DailyMemoryStorage(os.path.join(directory, "memory.db"), embedder=chapter_store.embedder)
+    recent_store = RecentStorage(os.path.join(directory, "recent.json"))
+    aggr = Aggregator(llm, chapter_store, daily_store)
+    memory = AgentMemory(llm=llm, chapter_store=chapter_store, recent_store=recent_store, aggr=aggr, **(memory_options or {}))
+    router = FastRouter(chapter_store, shadow_rate=router_shadow_rate) if fast_router else None
+    meta = MetaCognition(llm=llm, chapter_store=chapter_store, daily_store=daily_store, router=router,
+                         lexical=lexical)
+    rollups = RollupScheduler(aggr, max_workers=rollup_workers).start()
+    return Partition(user_id=user_id, chapter_store=chapter_store, daily_store=daily_store, recent_store=recent_store,
+                     aggr=aggr, memory=memory, meta=meta, rollups=rollups)
+
+
+class TenantManager:
+    """Per-user memory partitions under `root/<user_id>/`, kept open in an LRU.
+
+    At most `max_open` partitions stay open, and (if set) their chapter
+    indexes together hold at most `max_vectors` vectors; least recently used
+    partitions are flushed and closed beyond that, as are partitions idle for
+    `idle_timeout` seconds when `evict_idle` runs. Partitions checked out by a
+    caller are never evicted. One embedder (`embedding_model_name` is a
+    `make_embedder` spec, served by the daemon at `embedding_socket` if
+    given) is shared by all partitions.
+
+    Partitions are opened and closed outside the manager lock, so a slow
+    open or close only holds up requests for that user. A user's partition
+    is never open twice: `checkout` waits for one that is still opening or
+    closing.
+    """
+
+    def __init__(self, root: str, llm: LLMInterface, *, embedding_model_name: str = 'all-MiniLM-L6-v2',
+                 embedding_socket: Optional[str] = None,
+                 max_open: int = 32, max_vectors: Optional[int] = None, idle_timeout: Optional[float] = None,
+                 chapter_options: Optional[Dict[str, Any]] = None, memory_options: Optional[Dict[str, Any]] = None,
+                 router_shadow_rate: float = 0.0):
+        self.root = root
+        self.llm = llm
+        self.max_open = max_open
+        self.max_vectors = max_vectors
+        self.idle_timeout = idle_timeout
+        self.chapter_options = chapter_options
+        self.memory_options = memory_options
+        self.router_shadow_rate = router_shadow_rate
+        self.embedder = make_embedder(embedding_model_name, embedding_socket)
+        self.embedder.warm_up()
+        self._open: "OrderedDict[str, Partition]" = OrderedDict()
+        # set once the user's partition has finished opening / closing
+        self._opening: Dict[str, threading.Event] = {}
+        self._closing: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, user_id: str) -> Partition:
+        """Open (or reuse) a user's partition and pin it until `release`"""
+        if not USER_ID.match(user_id):
+            raise ValueError("user_id must match [A-Za-z0-9_-]{1,64}")
+        while True:
+            with self._lock:
+                part = self._open.get(user_id)
+                if part is not None:
+                    evicted = self._pin(user_id, part)
+                    break
+                busy = self._opening.get(user_id) or self._closing.get(user_id)
+                if busy is None:
+                    # this caller opens it, others wait on the placeholder
+                    opened = self._opening[user_id] = threading.Event()
+                    break
+            busy.wait()
+        if part is not None:
+            self._close(evicted)
+            return part
+
+        try:
+            part = open_partition(os.path.join(self.root, user_id), self.llm, user_id=user_id, embedder=self.embedder,
+                                  chapter_options=self.chapter_options, memory_options=self.memory_options,
+                                  router_shadow_rate=self.router_shadow_rate)
+        except BaseException:
+            with self._lock:
+                del self._opening[user_id]
+            opened.set()
+            raise
+        with self._lock:
+            self._open[user_id] = part
+            del self._opening[user_id]
+            evicted = self._pin(user_id, part)
+        opened.set()
+        self._close(evicted)
+        return part
+
+    def _pin(self, user_id: str, part: Partition) -> list:
+        """Mark `part` used and pinned (lock held); returns partitions evicted to make room"""
+        self._open.move_to_end(user_id)
+        part._refs += 1
+        part.last_used = time.monotonic()
+        return self._over_budget()
+
+    def _pop(self, user_id: str) -> Partition:
+        """Take a partition out of the LRU to close it (lock held)"""
+        self._closing[user_id] = threading.Event()
+        return self._open.pop(user_id)
+
+    def release(self, part: Partition) -> None:
+        with self._lock:
+            part._refs -= 1
+            part.last_used = time.monotonic()
+
+    @contextmanager
+    def acquire(self, user_id: str) -> Iterator[Partition]:
+        part = self.checkout(user_id)
+        try:
+            yield part
+        finally:
+            self.release(part)
+
+    def _over_budget(self) -> list:
+        """Pop LRU partitions past the limits (lock held); caller closes them"""
+        evicted = []
+        def total_vectors():
+            return sum(p.chapter_store.loaded_vectors() for p in self._open.values())
+        for user_id in list(self._open):
+            over = len(self._open) > self.max_open or (
+                self.max_vectors is not None and total_vectors() > self.max_vectors
+            )
+            if not over:
+                break
+            if self._open[user_id]._refs == 0:
+                evicted.append(self._pop(user_id))
+        return evicted
+
+    def evict_idle(self) -> int:
+        """Close partitions unused for `idle_timeout` seconds; returns how many"""
+        if self.idle_timeout is None:
+            return 0
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            evicted = [self._pop(user_id) for user_id, p in list(self._open.items())
+                       if p._refs == 0 and p.last_used < cutoff]
+        self._close(evicted)
+        return len(evicted)
+
+    def _close(self, partitions: list) -> None:
+        # flushing can take a while (LLM jobs, index checkpoint), never under the lock
+        for part in partitions:
+            try:
+                part.close()
+            finally:
+                with self._lock:
+                    closed = self._closing.pop(part.user_id)
+                closed.set()
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def router_report(self) -> dict:
+        """Fast-router decisions and shadow agreement summed over the open partitions"""
+        with self._lock:
+            reports = [p.meta.router.report() for p in self._open.values() if p.meta.router is not None]
+        decisions = sum(r["decisions"] for r in reports)
+        bypassed = sum(r["bypassed"] for r in reports)
+        shadowed = sum(r["shadowed"] for r in reports)
+        agreed = sum(r["agreement"] * r["shadowed"] for r in reports if r["shadowed"])
+        return {"partitions": len(reports), "decisions": decisions, "bypassed": bypassed,
+                "bypass_rate": bypassed / decisions if decisions else 0.0, "shadowed": shadowed,
+                "agreement": agreed / shadowed if shadowed else None}
+
+    def close(self) -> None:
+        with self._lock:
+            partitions = [self._pop(user_id) for user_id in list(self._open)]
+        self._close(partitions)
@@ -0,0 +1,39 @@
+import queue
+import threading
+import traceback
+from typing import Callable, Optional
+
+
+class MemoryWorker:
+    """Runs memory-maintenance jobs (summaries, snapshots, chapters) on one
+    background thread, strictly in submission order."""
+
+    def __init__(self, name: str = "memory-worker"):
+        self._jobs: "queue.Queue[Optional[Callable[[], None]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], None]) -> None:
+        self._jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except Exception:
+                # a failed job must not stop the jobs queued behind it
+                traceback.print_exc()
+            finally:
+                self._jobs.task_done()
+
+    def join(self) -> None:
+        """Block until every submitted job has run"""
+        self._jobs.join()
+
+    def close(self) -> None:
+        """Run the remaining jobs, then stop the thread"""
+        self._jobs.put(None)
+        self._thread.join()
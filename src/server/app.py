@@ -0,0 +1,178 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from aiohttp import web, WSMsgType
+
+from src.config import LLMConfig
+from src.core.llm_interface import AsyncLLMInterface
+from src.engine.async_engine import AsyncConversationEngine
+from src.engine.context_builder import ContextBuilder
+from src.llms.async_ollama_llm import AsyncOllamaLLM
+from src.llms.cached_llm import CachedLLM
+from src.llms.executor_llm import ExecutorLLM
+from src.memory.tenants import USER_ID, Partition, TenantManager
+from src.ui.cli import PROVIDER_CHOICES, make_llm
+
+# how often partitions idle past --idle-timeout are closed
+EVICT_INTERVAL = 60.0
+
+EngineFactory = Callable[[Partition], AsyncConversationEngine]
+
+
+
+
+async def _checkout(request: web.Request, user_id) -> Partition:
+    """Pin the user's partition (opening it if needed) and bind an engine to it"""
+    tenants: TenantManager = request.app["tenants"]
+    if not isinstance(user_id, str) or not USER_ID.match(user_id):
+        raise web.HTTPBadRequest(text="user_id must match [A-Za-z0-9_-]{1,64}")
+    # opening/evicting partitions touches disk, keep that off the loop
+    part = await asyncio.to_thread(tenants.checkout, user_id)
+    if part.engine is None:
+        part.engine = request.app["engine_factory"](part)
+    return part
+
+
+async def chat(request: web.Request) -> web.Response:
+    """POST /chat {"user_id", "message"} -> {"user_id", "reply"}"""
+    body = await request.json()
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise web.HTTPBadRequest(text="message is required")
+    part = await _checkout(request, body.get("user_id"))
+    try:
+        reply = await part.engine.astep(message.strip())
+    finally:
+        request.app["tenants"].release(part)
+    return web.json_response({"user_id": part.user_id, "reply": reply})
+
+
+async def chat_ws(request: web.Request) -> web.WebSocketResponse:
+    """GET /ws?user_id=... ; each text frame is a user message, the reply
+    streams back as {"type": "chunk"} frames followed by {"type": "done"}."""
+    part = await _checkout(request, request.query.get("user_id"))
+    try:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            reply = ""
+            try:
+                async for chunk in part.engine.astream_step(msg.data.strip()):
+                    reply += chunk
+                    await ws.send_json({"type": "chunk", "text": chunk})
+            except Exception as e:
+                await ws.send_json({"type": "error", "error": str(e)})
+                continue
+            await ws.send_json({"type": "done", "reply": reply})
+    finally:
+        request.app["tenants"].release(part)
+    return ws
+
+
+async def health(request: web.Request) -> web.Response:
+    # router counters cover the partitions currently open
+    return web.json_response({"status": "ok", "router": request.app["tenants"].router_report()})
+
+
+def create_app(tenants: TenantManager, engine_factory: EngineFactory) -> web.Application:
+    app = web.Application()
+    app["tenants"] = tenants
+    app["engine_factory"] = engine_factory
+    app.router.add_post("/chat", chat)
+    app.router.add_get("/ws", chat_ws)
+    app.router.add_get("/health", health)
+
+    async def evict_idle():
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            await asyncio.to_thread(tenants.evict_idle)
+
+    async def start_eviction(app: web.Application):
+        app["evictor"] = asyncio.create_task(evict_idle())
+
+    async def close_tenants(app: web.Application):
+        app["evictor"].cancel()
+        await asyncio.to_thread(tenants.close)
+
+    app.on_startup.append(start_eviction)
+    app.on_cleanup.append(close_tenants)
+    return app
+
+
+
+
+def make_async_llm(cfg: LLMConfig) -> AsyncLLMInterface:
+    if cfg.provider == "ollama":
+        return AsyncOllamaLLM(base_url=cfg.base_url or "http://localhost:11434", model=cfg.model or "llama3",
+                              keep_alive=cfg.keep_alive, chat=cfg.chat, temperature=cfg.temperature)
+    # providers without an async client run their blocking SDK on a thread pool
+    return ExecutorLLM(make_llm(cfg))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory‑First LLM – HTTP/WebSocket server")
+    parser.add_argument("--provider", choices=PROVIDER_CHOICES, default="ollama")
+    parser.add_argument("--model", default="llama3", help="Model name/tag for provider")
+    parser.add_argument("--base-url", default="http://localhost:11434", help="Ollama base URL (if provider=ollama)")
+    parser.add_argument("--keep-alive", default="10m", help="How long Ollama keeps the model loaded between calls (e.g. 10m; seconds, -1 = forever)")
+    parser.add_argument("--ollama-chat", action="store_true", help="Talk to Ollama's /api/chat endpoint instead of /api/generate")
+    parser.add_argument("--temp", type=float, default=0.2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", default=".", help="Root of the per-user memory partitions")
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2",
+                        help="sentence-transformers model name, or onnx:<dir> for an int8 ONNX export (no torch)")
+    parser.add_argument("--embedding-socket", default=None,
+                        help="Encode through the shared embedding service on this Unix socket (falls back to --embedder in-process)")
+    parser.add_argument("--max-open", type=int, default=32, help="Partitions kept open at once (LRU)")
+    parser.add_argument("--idle-timeout", type=float, default=900.0, help="Seconds before an idle partition is closed")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Don't cache summarization/rollup/metacognition LLM calls")
+    parser.add_argument("--llm-cache-ttl", type=float, default=None, help="Seconds a cached LLM response stays valid")
+    parser.add_argument("--router-shadow-rate", type=float, default=0.0,
+                        help="Share of fast-router decisions also sent to the LLM to measure agreement")
+    parser.add_argument("--sum-batch", type=int, default=4,
+                        help="Fold N evicted turns into the rolling summary per LLM call (the cached system prompt is reused for N turns)")
+    parser.add_argument("--context-budget", type=int, default=3000, help="Token budget of the reply prompt")
+    parser.add_argument("--speculation-workers", type=int, default=4,
+                        help="Threads for retrievals started before the metacognition decision (0 disables)")
+    args = parser.parse_args(argv)
+
+    cfg = LLMConfig(provider=args.provider, model=args.model, base_url=args.base_url, keep_alive=args.keep_alive, chat=args.ollama_chat, temperature=args.temp)
+    # background memory maintenance stays on the blocking client, replies and meta-analysis go async
+    os.makedirs(args.data_dir, exist_ok=True)
+    llm = CachedLLM(make_llm(cfg), os.path.join(args.data_dir, "llm_cache.db"), ttl=args.llm_cache_ttl,
+                    bypass=args.no_llm_cache)
+    async_llm = make_async_llm(cfg)
+
+    tenants = TenantManager(args.data_dir, llm, embedding_model_name=args.embedder,
+                            embedding_socket=args.embedding_socket, max_open=args.max_open, idle_timeout=args.idle_timeout,
+                            memory_options=dict(summarize_batch=args.sum_batch),
+                            router_shadow_rate=args.router_shadow_rate)
+    # speculative retrievals of all sessions share one pool
+    speculation_pool = ThreadPoolExecutor(max_workers=args.speculation_workers, thread_name_prefix="speculate")
+
+    def engine_factory(part: Partition) -> AsyncConversationEngine:
+        return AsyncConversationEngine(llm=async_llm, memory=part.memory, meta=part.meta,
+                                       executor=speculation_pool if args.speculation_workers else None,
+                                       context_builder=ContextBuilder(args.context_budget))
+
+    app = create_app(tenants, engine_factory)
+
+    async def close_llm(app: web.Application):
+        await async_llm.close()
+        speculation_pool.shutdown(wait=False, cancel_futures=True)
+        llm.close()
+
+    app.on_cleanup.append(close_llm)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
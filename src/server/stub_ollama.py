@@ -0,0 +1,130 @@
+"""Stub of Ollama's /api/generate and /api/chat for exercising the server and clients offline.
+
+Like llama.cpp behind Ollama, it only "evaluates" the part of a prompt that
+differs from the previous request's, so prompt_eval_count shows how much of
+a prompt layout is reused across turns. With `--load` the first request,
+and any after the previous request's keep_alive ran out, pays a model load
+reported as load_duration.
+
+    python -m src.server.stub_ollama --port 11435 --delay 0.05 --load 1.5
+    python -m src.server.app --base-url http://127.0.0.1:11435
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+
+from aiohttp import web
+
+
+def _reply(prompt: str, words: int) -> str:
+    # meta-cognition prompts must get parseable JSON back
+    if "meta-cognitive controller" in prompt:
+        return json.dumps({"strategy": "none", "params": {}})
+    return " ".join(f"token{i}" for i in range(words))
+
+
+def _rendered(body: dict) -> str:
+    # roughly what the model template turns the request into
+    if "messages" in body:
+        return "".join(f"<|{m.get('role')}|>{m.get('content', '')}" for m in body["messages"])
+    system = body.get("system")
+    return (f"<|system|>{system}" if system else "") + f"<|user|>{body.get('prompt', '')}"
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d*)?)(ns|us|µs|ms|s|m|h)")
+_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def keep_alive_seconds(value) -> float:
+    """Seconds a keep_alive value keeps the model loaded (inf when negative).
+
+    Numbers are seconds; strings are Go durations ("10m", "-1m") as Ollama
+    parses them, so a bare "-1" is rejected with ValueError like Ollama does.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = float(value)
+    else:
+        text = str(value)
+        sign, body = (-1.0, text[1:]) if text.startswith("-") else (1.0, text.lstrip("+"))
+        parts = _DURATION.findall(body)
+        if body != "0" and (not parts or "".join(n + u for n, u in parts) != body):
+            raise ValueError(f"time: missing unit in duration {text!r}")
+        seconds = sign * sum(float(n) * _UNITS[u] for n, u in parts)
+    return float("inf") if seconds < 0 else seconds
+
+
+def _shared_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def create_app(delay: float = 0.0, words: int = 32, load: float = 0.0) -> web.Application:
+    """`delay` is paid once before the first token (prompt eval) and once per
+    streamed chunk divided across the reply; `load` whenever the model is not
+    loaded."""
+    last = {"prompt": "", "loaded_until": 0.0}
+
+    async def generate(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        try:
+            keep_alive = keep_alive_seconds(body.get("keep_alive", "5m"))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        chat = "messages" in body
+        prompt = _rendered(body)
+        text = _reply(prompt, words)
+        load_duration = 0
+        if time.monotonic() >= last["loaded_until"]:
+            await asyncio.sleep(load)
+            load_duration = int(load * 1e9)
+        await asyncio.sleep(delay)
+        last["loaded_until"] = time.monotonic() + keep_alive
+        # only the tokens past the prefix shared with the previous request are evaluated
+        evaluated = len(prompt) - _shared_prefix(prompt, last["prompt"])
+        last["prompt"] = prompt
+        stats = {"prompt_eval_count": evaluated // 4 + 1, "eval_count": words,
+                 "load_duration": load_duration, "prompt_eval_duration": int(delay * 1e9 * evaluated / max(len(prompt), 1))}
+
+        def chunk_body(piece: str) -> dict:
+            return {"message": {"role": "assistant", "content": piece}} if chat else {"response": piece}
+
+        if not body.get("stream", True):
+            return web.json_response({"model": body.get("model"), **chunk_body(text), "done": True, **stats})
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        chunks = text.split(" ")
+        for i, chunk in enumerate(chunks):
+            piece = chunk if i == 0 else " " + chunk
+            await resp.write((json.dumps({**chunk_body(piece), "done": False}) + "\n").encode())
+            await asyncio.sleep(delay / len(chunks))
+        await resp.write((json.dumps({**chunk_body(""), "done": True, **stats}) + "\n").encode())
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/chat", generate)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--words", type=int, default=32, help="Words per reply")
+    parser.add_argument("--load", type=float, default=0.0, help="Seconds a model load takes (first request, or after keep_alive)")
+    args = parser.parse_args(argv)
+    web.run_app(create_app(args.delay, args.words, args.load), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
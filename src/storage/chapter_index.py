@@ -0,0 +1,363 @@
+import os
+import threading
+import time
+import warnings
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import faiss
+
+
+# (after_id) -> (chapter ids, normalized float32 vectors) for chapters with id > after_id
+VectorLoader = Callable[[int], Tuple[np.ndarray, np.ndarray]]
+
+# vector codecs for the checkpointed index, as index_factory descriptions
+CODECS = {
+    "flat": "Flat",      # exact float32
+    "fp16": "SQfp16",    # half precision, no training
+    "sq8": "SQ8",        # 8-bit scalar quantizer, 4x smaller
+    "pq": "PQ{pq_m}",    # product quantizer, pq_m bytes per vector
+}
+
+
+# approximate search tiers the base switches to past `ann_threshold` chapters
+TIERS = ("hnsw", "ivf")
+
+# cap on vectors used to train quantizers / IVF centroids
+MAX_TRAIN = 100_000
+
+# stored vectors searched in both a freshly written base and its memory-mapped read
+MMAP_CHECK_QUERIES = 32
+
+
+def _codec_of(sub) -> str:
+    if isinstance(sub, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(sub, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if sub.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def _layout_of(index) -> Tuple[str, str]:
+    """(tier, codec) of an id-mapped index"""
+    sub = faiss.downcast_index(index.index)
+    if isinstance(sub, faiss.IndexHNSW):
+        return "hnsw", _codec_of(faiss.downcast_index(sub.storage))
+    if isinstance(sub, faiss.IndexIVF):
+        return "ivf", _codec_of(sub)
+    return "flat", _codec_of(sub)
+
+
+class ChapterIndex:
+    """FAISS index over chapter embeddings, keyed by chapter id.
+
+    The index file on disk is only a checkpoint (the base index). Chapters
+    saved after it are kept in a small in-memory flat delta index and are
+    replayed on load from the embeddings stored in the chapters table, which
+    act as the append-only vector log. Saves therefore never rewrite the
+    index; a background checkpoint folds the delta into the base once
+    `checkpoint_every` vectors are pending or `checkpoint_interval` seconds passed.
+
+    The base can store quantized codes (`codec`) and be opened memory-mapped
+    (`mmap`), so it loads lazily and its pages are shared between processes.
+    Codecs that need training stay flat until `train_size` chapters exist.
+
+    Past `ann_threshold` chapters the base is rebuilt in the background as an
+    approximate index (`ann`: HNSW or IVF); the current base keeps answering
+    until the new one is swapped in. `ef_search` / `nprobe` are the default
+    search knobs and can be overridden per query.
+    """
+
+    def __init__(self, path: str, dim: int, load_vectors: VectorLoader,
+                 checkpoint_every: int = 256, checkpoint_interval: float = 300.0,
+                 codec: str = "flat", pq_m: int = 16, train_size: int = 1000, mmap: bool = False,
+                 ann: Optional[str] = "hnsw", ann_threshold: int = 50_000, hnsw_m: int = 32,
+                 ivf_nlist: Optional[int] = None, ef_search: int = 64, nprobe: int = 16):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown index codec: {codec} (expected one of {', '.join(CODECS)})")
+        if ann is not None and ann not in TIERS:
+            raise ValueError(f"Unknown ANN index: {ann} (expected one of {', '.join(TIERS)})")
+        self.path = path
+        self.dim = dim
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.codec = codec
+        self.pq_m = pq_m
+        self.train_size = train_size
+        self.mmap = mmap
+        self.ann = ann
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.ivf_nlist = ivf_nlist
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self._load_vectors = load_vectors
+        self._lock = threading.Lock()           # guards base/delta
+        self._checkpointing = threading.Lock()  # one checkpoint at a time
+        self._mmap_refused: Optional[Tuple[str, str]] = None  # layout whose mapping answered differently
+        self._base_mapped = False  # base is served from the memory-mapped checkpoint
+        self._last_checkpoint = time.monotonic()
+        self._load()
+
+    def _new_flat(self):
+        # inner product over normalized vectors, ids are chapter ids
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+
+    def _read(self):
+        if self.mmap:
+            flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+            return faiss.read_index(self.path, flags)
+        return faiss.read_index(self.path)
+
+    def _load(self):
+        try:
+            # read into memory first: a mapped base is only kept if it answers the same
+            base = faiss.read_index(self.path)
+        except Exception:
+            base = None
+        stored = faiss.vector_to_array(base.id_map) if base is not None and hasattr(base, 'id_map') else None
+        if stored is None or len(np.unique(stored)) != len(stored):
+            # missing, a legacy index keyed by position, or a checkpoint holding an id
+            # twice (written by older versions): rebuild from stored chapters
+            base = self._new_flat()
+            base_max = 0
+        else:
+            base_max = int(stored.max()) if len(stored) else 0
+
+        # replay chapters saved after the checkpoint
+        delta = self._new_flat()
+        ids, vectors = self._load_vectors(base_max)
+        if len(ids):
+            delta.add_with_ids(vectors, ids)
+
+        layout = _layout_of(base)
+        if self.mmap and base_max:
+            base = self._mapped(base, layout)
+        self._base = base
+        self._base_layout = layout
+        self._base_max = base_max
+        self._delta = delta
+        self._max_id = int(ids.max()) if len(ids) else base_max
+        self._maybe_checkpoint()
+
+    def __len__(self) -> int:
+        return self._base.ntotal + self._delta.ntotal
+
+    def _target_layout(self, n: int) -> Tuple[str, str]:
+        tier = self.ann if self.ann and n >= self.ann_threshold else "flat"
+        if self.codec == "flat" or self.codec == "fp16" or n >= self.train_size:
+            return tier, self.codec
+        return tier, "flat"  # not enough vectors to train the quantizer yet
+
+    def _search_params(self, ef_search: Optional[int], nprobe: Optional[int], tier: Optional[str] = None):
+        tier = tier or self._base_layout[0]
+        if tier == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search)
+        if tier == "ivf":
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe)
+        return None
+
+    def add(self, chapter_id: int, vector: np.ndarray):
+        """Add one chapter vector; O(1), the checkpoint happens in the background"""
+        with self._lock:
+            self._delta.add_with_ids(np.expand_dims(vector, axis=0), np.array([chapter_id], dtype=np.int64))
+            self._max_id = max(self._max_id, chapter_id)
+        self._maybe_checkpoint()
+
+    def search(self, query: np.ndarray, k: int,
+               ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (chapter_id, score) pairs in score order.
+
+        `ef_search` (HNSW) and `nprobe` (IVF) override the defaults for this query;
+        they are ignored while the base is still flat.
+        """
+        with self._lock:
+            return self._search_in(self._base, query, k, self._search_params(ef_search, nprobe))
+
+    def _search_in(self, base, query: np.ndarray, k: int, params) -> List[Tuple[int, float]]:
+        # the caller holds the lock (the delta is shared)
+        query = np.expand_dims(query, axis=0)
+        hits = []
+        for index, index_params in ((base, params), (self._delta, None)):
+            if index.ntotal:
+                D, I = index.search(query, k, params=index_params)
+                hits.extend((int(i), float(d)) for i, d in zip(I[0], D[0]) if i != -1)
+        hits.sort(key=lambda h: h[1], reverse=True)
+        return hits[:k]
+
+    def _needs_checkpoint(self) -> bool:
+        pending = self._delta.ntotal
+        if self._base_layout != self._target_layout(len(self)):
+            return True
+        return pending >= self.checkpoint_every or (
+            pending > 0 and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        )
+
+    def _maybe_checkpoint(self):
+        if self._needs_checkpoint() and self._checkpointing.acquire(blocking=False):
+            threading.Thread(target=self._background_checkpoint, daemon=True).start()
+
+    def _background_checkpoint(self):
+        try:
+            self._write_checkpoint()
+        finally:
+            self._checkpointing.release()
+
+    def checkpoint(self):
+        """Write a full checkpoint now, blocking until it is on disk"""
+        with self._checkpointing:
+            self._write_checkpoint()
+
+    def _description(self, layout: Tuple[str, str], n: int) -> str:
+        tier, codec = layout
+        codes = CODECS[codec].format(pq_m=self.pq_m)
+        if tier == "hnsw":
+            return f"IDMap2,HNSW{self.hnsw_m}" + ("" if codec == "flat" else f"_{codes}")
+        if tier == "ivf":
+            nlist = self.ivf_nlist or max(1, int(4 * np.sqrt(n)))
+            return f"IDMap2,IVF{nlist},{codes}"
+        return f"IDMap2,{codes}"
+
+    def _build(self, ids: np.ndarray, vectors: np.ndarray, layout: Tuple[str, str]):
+        """Fresh base index with the given layout, trained on the vectors it holds"""
+        index = faiss.index_factory(self.dim, self._description(layout, len(ids)), faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            train = vectors
+            if len(train) > MAX_TRAIN:
+                train = vectors[np.random.default_rng(0).choice(len(vectors), MAX_TRAIN, replace=False)]
+            index.train(train)
+        if len(ids):
+            index.add_with_ids(vectors, ids)
+        return index
+
+    def _write_file(self, data: np.ndarray):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            data.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)  # atomic, a crash keeps the previous checkpoint
+
+    def _write_checkpoint(self):
+        with self._lock:
+            upto = self._max_id
+            layout = self._target_layout(len(self))
+            rebuild = layout != self._base_layout
+            if not rebuild and not self._delta.ntotal and os.path.exists(self.path):
+                return
+            if not rebuild and not self.mmap:
+                # writable in-memory base: fold the delta in place, searches only
+                # wait for the add
+                n = self._delta.ntotal
+                if n:
+                    ids = faiss.vector_to_array(self._delta.id_map)
+                    # once per id: skip ids the base already holds and repeats within the delta
+                    ids, first = np.unique(ids, return_index=True)
+                    fresh = ~np.isin(ids, faiss.vector_to_array(self._base.id_map))
+                    if fresh.any():
+                        vectors = self._delta.index.reconstruct_n(0, n)[first[fresh]]
+                        self._base.add_with_ids(vectors, ids[fresh])
+                    self._delta.reset()
+                self._base_max = upto
+                base = self._base
+        if not rebuild and not self.mmap:
+            # searches and serialization only read the base, and only this (checkpointing)
+            # thread writes to it, so the copy is made outside the lock
+            self._write_file(faiss.serialize_index(base))
+            self._last_checkpoint = time.monotonic()
+            return
+
+        # tier switch, quantizer (re)training or a read-only mapped base: build a new
+        # base aside while the current one keeps serving searches
+        if rebuild or not os.path.exists(self.path):
+            ids, vectors = self._load_vectors(0)
+            keep = ids <= upto
+            base = self._build(ids[keep], vectors[keep], layout)
+        else:
+            base = faiss.read_index(self.path)  # writable copy of the mapped checkpoint
+            ids, vectors = self._load_vectors(self._base_max)
+            keep = ids <= upto
+            if keep.any():
+                base.add_with_ids(vectors[keep], ids[keep])
+        self._write_file(faiss.serialize_index(base))
+        if self.mmap:
+            base = self._mapped(base, layout)
+
+        with self._lock:
+            self._base = base
+            self._base_layout = layout
+            self._base_max = upto
+            self._delta.remove_ids(faiss.IDSelectorRange(0, upto + 1))
+        self._last_checkpoint = time.monotonic()
+
+    def _mapped(self, written, layout: Tuple[str, str]):
+        """Memory-mapped read of the checkpoint, or `written` itself if the mapping
+        answers a sample of queries differently."""
+        self._base_mapped = False
+        if self._mmap_refused == layout or not written.ntotal:
+            return written
+        mapped = self._read()
+        queries = np.random.default_rng(0).standard_normal((MMAP_CHECK_QUERIES, self.dim)).astype(np.float32)
+        faiss.normalize_L2(queries)
+        params = self._search_params(None, None, layout[0])
+        k = min(10, written.ntotal)
+        if not np.array_equal(written.search(queries, k, params=params)[1], mapped.search(queries, k, params=params)[1]):
+            # keep serving from memory rather than from a mapping that answers differently
+            warnings.warn(f"{self.path}: the memory-mapped {layout[0]}/{layout[1]} index answers differently "
+                          f"from the one written, keeping it in memory")
+            self._mmap_refused = layout
+            return written
+        self._base_mapped = True
+        return mapped
+
+    def recall_at_k(self, k: int = 10, n_queries: int = 100, seed: int = 0,
+                    ef_search: Optional[int] = None, nprobe: Optional[int] = None, min_recall: float = 0.9) -> dict:
+        """Recall@k of this index against exact search over the stored float32 vectors.
+
+        Queries are sampled from the stored chapter vectors. `top1` is the share
+        of queries whose exact nearest chapter is found. A memory-mapped base is
+        also measured read into memory (`recall_in_memory`); `ok` is False, with
+        a `warning`, when recall is below `min_recall`, the two differ or the
+        mapping was refused.
+        """
+        tier, codec = self._base_layout
+        ids, vectors = self._load_vectors(0)
+        if not len(ids):
+            return {"tier": tier, "codec": codec, "k": k, "queries": 0, "recall": 1.0, "top1": 1.0, "ok": True}
+        rng = np.random.default_rng(seed)
+        queries = vectors[rng.choice(len(ids), size=min(n_queries, len(ids)), replace=False)]
+
+        exact = faiss.IndexFlatIP(self.dim)
+        exact.add(vectors)
+        _, truth = exact.search(queries, k)
+        expected = [[int(ids[i]) for i in row if i != -1] for row in truth]
+
+        def measure(base) -> Tuple[float, float]:
+            hits = top1 = 0
+            with self._lock:
+                params = self._search_params(ef_search, nprobe)
+                results = [self._search_in(base, query, k, params) for query in queries]
+            for found, exp in zip(results, expected):
+                found = {chapter_id for chapter_id, _ in found}
+                hits += len(found & set(exp))
+                top1 += exp[0] in found
+            return hits / (len(queries) * min(k, len(ids))), top1 / len(queries)
+
+        recall, top1 = measure(self._base)
+        report = {"tier": tier, "codec": codec, "k": k, "queries": len(queries), "recall": recall, "top1": top1}
+        problems = []
+        if recall < min_recall:
+            problems.append(f"recall@{k} {recall:.3f} is below {min_recall}")
+        if self._base_mapped:
+            report["recall_in_memory"], _ = measure(faiss.read_index(self.path))
+            if abs(report["recall_in_memory"] - recall) > 1e-9:
+                problems.append(f"memory-mapped recall {recall:.3f} differs from {report['recall_in_memory']:.3f} in memory")
+        elif self.mmap and self._mmap_refused == self._base_layout:
+            problems.append(f"the memory-mapped {tier}/{codec} index answered differently, it is served from memory")
+        report["ok"] = not problems
+        if problems:
+            report["warning"] = "; ".join(problems)
+        return report
+
+    def close(self):
+        self.checkpoint()
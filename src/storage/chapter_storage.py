@@ -1,126 +1,270 @@
+import re
 import sqlite3
+import threading
+import warnings
+from collections import defaultdict
 from datetime import date
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 import json
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 
+from src.core.embedding_interface import Embedder
 from src.core.memory_interface import Chapter
+from src.embeddings.factory import make_embedder
+from src.storage.sqlite_db import SQLiteDB
+
+if TYPE_CHECKING:
+    from src.storage.chapter_index import ChapterIndex
+
+# hyphenated codes (ERR-404, inc-0626) stay one term; FTS5 matches a quoted one as a phrase
+_FTS_TERM = re.compile(r"\w+(?:-\w+)*")
+# question words and function words match most chapters: they add nothing to BM25 but make
+# every query score nearly the whole table
+_FTS_STOPWORDS = frozenset("""
+a about after again all am an and any are as at be been before but by can could did do does
+for from had has have how i if in into is it its me my no not of on or our so than that the
+their them then there these they this to up was we were what when where which who why will
+with would you your
+""".split())
+
+
+def fts_query(text: str, max_terms: int = 32) -> Optional[str]:
+    """FTS5 MATCH expression for free text: each word or hyphenated code quoted (no query syntax), OR-ed for BM25 ranking"""
+    words = [t.lower() for t in _FTS_TERM.findall(text)]
+    # a query of nothing but stopwords still searches for them
+    terms = [t for t in words if t not in _FTS_STOPWORDS] or words
+    terms = list(dict.fromkeys(terms))[:max_terms]
+    return " OR ".join(f'"{t}"' for t in terms) if terms else None
+
+
+def _day_clause(start: Optional[date], end: Optional[date], days: Optional[Sequence[date]]) -> Tuple[str, list]:
+    """SQL condition (and its parameters) restricting chapters.day to [start, end] or to a set of days.
+
+    `end` defaults to `start` (one day); with only `end`, every day up to it.
+    """
+    if days is not None:
+        return f"chapters.day IN ({','.join('?' * len(days))})", [d.isoformat() for d in days]
+    if start is None:
+        return "chapters.day <= ?", [end.isoformat()]
+    return "chapters.day BETWEEN ? AND ?", [start.isoformat(), (end or start).isoformat()]
 
 
 class ChapterStorage:
-    def __init__(self, db_path='chapters.db', faiss_index_path='chapters.faiss', embedding_model_name='all-MiniLM-L6-v2'):
+    """Chapters in SQLite, searchable through a FAISS index over their embeddings.
+
+    The embedder and the index (and with them torch/onnxruntime and faiss)
+    are loaded on first use; `warmup` starts loading the embedder in the
+    background right away. The embedder's model id and dimension are recorded
+    in a meta table the first time it is used; reopening the store with an
+    embedder of another dimension raises ValueError.
+
+    An FTS5 table (chapters_fts) indexes the chapter text for BM25 search and
+    is kept in sync by triggers; `hybrid_search` fuses it with the dense
+    results. Without FTS5 in the SQLite build, `lexical` is False and
+    hybrid search is dense only.
+    """
+
+    def __init__(self, db_path='chapters.db', faiss_index_path='chapters.faiss', embedding_model_name='all-MiniLM-L6-v2',
+                 checkpoint_every: int = 256, checkpoint_interval: float = 300.0,
+                 index_codec: str = 'flat', index_mmap: bool = False,
+                 index_ann: Optional[str] = 'hnsw', ann_threshold: int = 50_000,
+                 embedder: Optional[Embedder] = None, warmup: bool = True):
         self.db_path = db_path
         self.faiss_index_path = faiss_index_path
-        self.conn = sqlite3.connect(self.db_path,check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.model = SentenceTransformer(embedding_model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
+        # per-thread connections: saves, rollups, retrieval threads and the index checkpoint share the file
+        self.db = SQLiteDB(self.db_path)
+        # pass `embedder` to share one between several stores
+        self.embedder = embedder or make_embedder(embedding_model_name)
+        if warmup:
+            self.embedder.warm_up()
+        self._dim: Optional[int] = None
         self._create_tables()
-        self._load_faiss_index()
+        self._index: Optional["ChapterIndex"] = None
+        self._index_options = dict(checkpoint_every=checkpoint_every, checkpoint_interval=checkpoint_interval,
+                                   codec=index_codec, mmap=index_mmap, ann=index_ann, ann_threshold=ann_threshold)
+        self._index_lock = threading.Lock()
+
+    @property
+    def embedding_dim(self) -> int:
+        if self._dim is None:
+            self._dim = self._check_embedding_space()
+        return self._dim
+
+    def _check_embedding_space(self) -> int:
+        """Compare the embedder with the one the stored vectors came from; record it if new"""
+        dim = self.embedder.dim
+        meta = dict(self.db.query('SELECT key, value FROM meta'))
+        if 'embedding_dim' not in meta:
+            # stores from before the meta table: go by a stored vector
+            row = self.db.execute('SELECT embedding FROM chapters WHERE embedding IS NOT NULL LIMIT 1').fetchone()
+            if row is not None and len(row[0]) // 4 != dim:
+                raise ValueError(f"{self.db_path} holds {len(row[0]) // 4}-d embeddings, "
+                                 f"embedder {self.embedder.model_id!r} produces {dim}-d")
+            with self.db.transaction() as conn:
+                conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                 [('embedding_model', self.embedder.model_id), ('embedding_dim', str(dim))])
+            return dim
+        if int(meta['embedding_dim']) != dim:
+            raise ValueError(f"{self.db_path} was built with {meta.get('embedding_model')!r} "
+                             f"({meta['embedding_dim']}-d), embedder {self.embedder.model_id!r} produces {dim}-d")
+        if meta.get('embedding_model') != self.embedder.model_id:
+            warnings.warn(f"{self.db_path} was built with {meta.get('embedding_model')!r}, "
+                          f"searching it with {self.embedder.model_id!r}")
+        return dim
+
+    @property
+    def index(self) -> "ChapterIndex":
+        """FAISS index, opened (and replayed from SQLite) on first use"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    from src.storage.chapter_index import ChapterIndex
+                    self._index = ChapterIndex(self.faiss_index_path, self.embedding_dim, self._stored_vectors,
+                                               **self._index_options)
+        return self._index
+
+    def loaded_vectors(self) -> int:
+        """Vectors held in memory by the index, 0 while it is not opened"""
+        return len(self._index) if self._index is not None else 0
 
     def _create_tables(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chapters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day TEXT,
-                memory TEXT,
-                tags TEXT
-            )
+        with self.db.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chapters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    day TEXT,
+                    memory TEXT,
+                    tags TEXT,
+                    embedding BLOB
+                )
+            ''')
+            # databases created before embeddings were persisted lack the column
+            if 'embedding' not in {r[1] for r in conn.execute('PRAGMA table_info(chapters)')}:
+                conn.execute('ALTER TABLE chapters ADD COLUMN embedding BLOB')
+            # day lookups (by day, ranges, rollup scans) would otherwise scan the whole table
+            conn.execute('CREATE INDEX IF NOT EXISTS chapters_day ON chapters(day)')
+            # the FAISS index is keyed by chapter id, the old position map is obsolete
+            conn.execute('DROP TABLE IF EXISTS faiss_map')
+            # embedding model/dimension the stored vectors were made with
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.lexical = self._create_fts(conn)
+
+    @staticmethod
+    def _create_fts(conn: sqlite3.Connection) -> bool:
+        """Full-text index over memory and tags, external content on chapters; False if FTS5 is unavailable"""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chapters_fts'").fetchone()
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chapters_fts "
+                         "USING fts5(memory, tags, content='chapters', content_rowid='id')")
+        except sqlite3.OperationalError:
+            return False
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS chapters_fts_insert AFTER INSERT ON chapters BEGIN
+                INSERT INTO chapters_fts (rowid, memory, tags) VALUES (new.id, new.memory, new.tags);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS chapters_fts_delete AFTER DELETE ON chapters BEGIN
+                INSERT INTO chapters_fts (chapters_fts, rowid, memory, tags) VALUES ('delete', old.id, old.memory, old.tags);
+            END
         ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS faiss_map (
-                chapter_id INTEGER PRIMARY KEY,
-                faiss_id INTEGER
-            )
+        # embedding backfills update other columns and leave the text index alone
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS chapters_fts_update AFTER UPDATE OF memory, tags ON chapters BEGIN
+                INSERT INTO chapters_fts (chapters_fts, rowid, memory, tags) VALUES ('delete', old.id, old.memory, old.tags);
+                INSERT INTO chapters_fts (rowid, memory, tags) VALUES (new.id, new.memory, new.tags);
+            END
         ''')
-        self.conn.commit()
+        if not exists:
+            # chapters saved before the index existed
+            conn.execute("INSERT INTO chapters_fts (chapters_fts) VALUES ('rebuild')")
+        return True
 
-    def _load_faiss_index(self):
-        try:
-            self.index = faiss.read_index(self.faiss_index_path)
-            self.next_faiss_id = self.index.ntotal
-        except:
-            # create new index if not exists
-            self.index = faiss.IndexFlatIP(self.embedding_dim)  # inner product
-            self.next_faiss_id = 0
+    def _stored_vectors(self, after_id: int = 0):
+        """Stored (ids, embeddings) of chapters with id > after_id, used to replay the index"""
+        # the index also calls this from its checkpoint thread
+        rows = self.db.query('SELECT id, memory, tags, day, embedding FROM chapters WHERE id > ? ORDER BY id',
+                             (after_id,))
+        rows = self._backfill_embeddings(rows)
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        if not rows:
+            return ids, np.empty((0, self.embedding_dim), dtype=np.float32)
+        return ids, np.vstack([np.frombuffer(r[4], dtype=np.float32) for r in rows])
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts, rows normalized for cosine similarity"""
+        self.embedding_dim  # checks the embedder against the stored vectors once
+        return self.embedder.encode(texts)
+
+    def _encode(self, text: str) -> np.ndarray:
+        """Embed a single text, normalized for cosine similarity"""
+        return self._embed([text])[0]
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Query embedding, to pass as `query_emb` when one message is searched several times"""
+        return self._encode(query)
 
     def save(self, chapter: Chapter):
         """Save chapter metadata + embedding"""
+        # open the index before the insert: opening replays stored rows, and would
+        # replay this one too before the add below
+        index = self.index
+        # Compute embedding once, it is stored alongside the chapter
+        embedding = self._encode(chapter.memory)
+
         # Save chapter metadata
         tags_json = json.dumps(chapter.tags) if chapter.tags else None
-        self.cursor.execute('''
-            INSERT INTO chapters (day, memory, tags) VALUES (?, ?, ?)
-        ''', (chapter.day.isoformat(), chapter.memory, tags_json))
-        chapter_id = self.cursor.lastrowid
-        self.conn.commit()
-
-        # Compute embedding
-        embedding = self.model.encode(chapter.memory, convert_to_numpy=True)
-        embedding = embedding / np.linalg.norm(embedding)  # normalize for cosine similarity
-
-        # Add to FAISS
-        self.index.add(np.expand_dims(embedding, axis=0))
-        faiss_id = self.next_faiss_id
-        self.next_faiss_id += 1
-
-        # Map chapter_id to faiss_id
-        self.cursor.execute('''
-            INSERT INTO faiss_map (chapter_id, faiss_id) VALUES (?, ?)
-        ''', (chapter_id, faiss_id))
-        self.conn.commit()
-
-        # Save FAISS index to disk
-        faiss.write_index(self.index, self.faiss_index_path)
+        chapter_id = self.db.execute('''
+            INSERT INTO chapters (day, memory, tags, embedding) VALUES (?, ?, ?, ?)
+        ''', (chapter.day.isoformat(), chapter.memory, tags_json, embedding.tobytes())).lastrowid
+
+        # Add to FAISS under the chapter id; the stored embedding is the durable copy
+        # until the index checkpoints it to disk
+        index.add(chapter_id, embedding)
 
     def retrieve_by_day(self, day: date) -> List[Chapter]:
         """Get all chapters for a given day"""
-        self.cursor.execute('SELECT memory, tags, day FROM chapters WHERE day = ?', (day.isoformat(),))
-        rows = self.cursor.fetchall()
+        rows = self.db.query('SELECT memory, tags, day FROM chapters WHERE day = ? ORDER BY id', (day.isoformat(),))
         return [Chapter(day=date.fromisoformat(r[2]), memory=r[0], tags=json.loads(r[1]) if r[1] else None) for r in rows]
 
-    def semantic_retrieve(self, query: str, top_k: int = 5, day_filter: Optional[date] = None) -> List[dict]:
-        """Retrieve chapters semantically using FAISS + optional day filter"""
-        query_emb = self.model.encode(query, convert_to_numpy=True)
-        query_emb = query_emb / np.linalg.norm(query_emb)
-
-        # Search FAISS
-        D, I = self.index.search(np.expand_dims(query_emb, axis=0), top_k*3)  # get extra in case day filter reduces results
-        retrieved = []
-
-        for faiss_id, score in zip(I[0], D[0]):
-            if faiss_id == -1:
-                continue
-            # Map faiss_id -> chapter_id
-            self.cursor.execute('SELECT chapter_id FROM faiss_map WHERE faiss_id = ?', (faiss_id,))
-            res = self.cursor.fetchone()
-            if not res:
-                continue
-            chapter_id = res[0]
-            # Fetch chapter metadata
-            self.cursor.execute('SELECT memory, tags, day FROM chapters WHERE id = ?', (chapter_id,))
-            row = self.cursor.fetchone()
-            if not row:
-                continue
-            chap_day = date.fromisoformat(row[2])
-            if day_filter and chap_day != day_filter:
-                continue
-            chapter = Chapter(day=chap_day, memory=row[0], tags=json.loads(row[1]) if row[1] else None)
-            retrieved.append({"chapter": chapter, "score": float(score)})
-
-        # Sort: latest day first, then score
-        retrieved.sort(key=lambda x: (x["chapter"].day, x["score"]), reverse=True)
-        return retrieved[:top_k]
+    def chapter_days(self) -> List[date]:
+        """Distinct days that have chapters, oldest first"""
+        rows = self.db.query('SELECT DISTINCT day FROM chapters ORDER BY day')
+        return [date.fromisoformat(r[0]) for r in rows]
+
+    def _fetch_chapters(self, ids: List[int]) -> Dict[int, Chapter]:
+        """Load chapters for a set of ids with a single query"""
+        if not ids:
+            return {}
+        placeholders = ','.join('?' * len(ids))
+        rows = self.db.query(f'SELECT id, memory, tags, day FROM chapters WHERE id IN ({placeholders})', ids)
+        return {
+            r[0]: Chapter(day=date.fromisoformat(r[3]), memory=r[1], tags=json.loads(r[2]) if r[2] else None)
+            for r in rows
+        }
+
+    def _search(self, query: str, k: int, query_emb: Optional[np.ndarray] = None, **search_params) -> List[tuple]:
+        """FAISS search returning (chapter_id, score) pairs in score order"""
+        return self.index.search(self._encode(query) if query_emb is None else query_emb, k, **search_params)
+
+    def semantic_retrieve(self, query: str, top_k: int = 5, day_filter: Optional[date] = None,
+                          ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[dict]:
+        """Retrieve chapters semantically using FAISS + optional day filter.
+
+        `ef_search` / `nprobe` tune the approximate index for this query.
+        """
+        if day_filter:
+            # filtered in SQL: post-filtering FAISS hits can miss the day's chapters entirely
+            return self.semantic_retrieve_day(query, day_filter, top_k=top_k)
+        return self.semantic_retrieve_global(query, top_k=top_k, ef_search=ef_search, nprobe=nprobe)
     
     def get_last_chapter(self) -> Chapter | None:
         """Return the most recently saved chapter"""
-        self.cursor.execute('''
+        row = self.db.execute('''
             SELECT memory, tags, day FROM chapters
             ORDER BY id DESC
             LIMIT 1
-        ''')
-        row = self.cursor.fetchone()
+        ''').fetchone()
         if not row:
             return None
         return Chapter(
@@ -130,78 +274,140 @@ class ChapterStorage:
         )
         
         
-    def semantic_retrieve_global(self, query: str, top_k: int = 5) -> List[dict]:
-        """Search globally across all chapters in FAISS"""
-        query_emb = self.model.encode(query, convert_to_numpy=True)
-        query_emb = query_emb / np.linalg.norm(query_emb)
-
-        D, I = self.index.search(np.expand_dims(query_emb, axis=0), top_k)
-        results = []
-        for faiss_id, score in zip(I[0], D[0]):
-            if faiss_id == -1:
-                continue
-            # Map faiss_id -> chapter_id
-            self.cursor.execute('SELECT chapter_id FROM faiss_map WHERE faiss_id = ?', (faiss_id,))
-            res = self.cursor.fetchone()
-            if not res:
-                continue
-            chapter_id = res[0]
-            self.cursor.execute('SELECT memory, tags, day FROM chapters WHERE id = ?', (chapter_id,))
-            row = self.cursor.fetchone()
-            if not row:
-                continue
-            results.append({
-                "chapter": Chapter(
-                    day=date.fromisoformat(row[2]),
-                    memory=row[0],
-                    tags=json.loads(row[1]) if row[1] else None
-                ),
-                "score": float(score)
-            })
-        return results
-
-
-    def semantic_retrieve_range(self, query: str, start: date, end: date, top_k: int = 5) -> List[dict]:
-        """Retrieve semantically but restricted to chapters in [start, end]"""
-        # 1. Fetch all chapters in range
-        self.cursor.execute('''
-            SELECT id, memory, tags, day FROM chapters
-            WHERE day BETWEEN ? AND ?
-        ''', (start.isoformat(), end.isoformat()))
-        rows = self.cursor.fetchall()
+    def semantic_retrieve_global(self, query: str, top_k: int = 5,
+                                 ef_search: Optional[int] = None, nprobe: Optional[int] = None,
+                                 query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        """Search globally across all chapters in FAISS.
+
+        `ef_search` / `nprobe` tune the approximate index for this query;
+        `query_emb` skips encoding `query` (see `encode_query`).
+        """
+        hits = self._search(query, top_k, query_emb, ef_search=ef_search, nprobe=nprobe)
+        chapters = self._fetch_chapters([chapter_id for chapter_id, _ in hits])
+        return [
+            {"chapter": chapters[chapter_id], "score": score}
+            for chapter_id, score in hits
+            if chapter_id in chapters
+        ]
+
+
+    def _backfill_embeddings(self, rows: list) -> list:
+        """Encode and store embeddings for rows saved before they were persisted.
+
+        Rows are (id, memory, tags, day, embedding); returned with embedding filled.
+        """
+        missing = [i for i, r in enumerate(rows) if r[4] is None]
+        if not missing:
+            return rows
+        emb = self._embed([rows[i][1] for i in missing])
+        rows = list(rows)
+        for i, e in zip(missing, emb):
+            rows[i] = rows[i][:4] + (e.tobytes(),)
+        with self.db.transaction() as conn:
+            conn.executemany('UPDATE chapters SET embedding = ? WHERE id = ?',
+                             [(rows[i][4], rows[i][0]) for i in missing])
+        return rows
+
+    def _filtered_search(self, query_emb: np.ndarray, where: str, params: list, k: int) -> Tuple[List[tuple], Dict[int, Chapter]]:
+        """Exact search over the stored vectors of the chapters matching `where`: (id, score) hits and their chapters"""
+        # 1. Fetch the matching chapters with their stored embeddings (day conditions use the day index)
+        rows = self.db.query(f'SELECT id, memory, tags, day, embedding FROM chapters WHERE {where}', params)
         if not rows:
+            return [], {}
+        rows = self._backfill_embeddings(rows)
+
+        # 2. Score stored vectors against the query
+        emb = np.vstack([np.frombuffer(r[4], dtype=np.float32) for r in rows])
+        scores = emb @ query_emb
+
+        # 3. Top-k by score
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = [(rows[i][0], float(scores[i])) for i in top]
+        chapters = {
+            rows[i][0]: Chapter(day=date.fromisoformat(rows[i][3]), memory=rows[i][1],
+                                tags=json.loads(rows[i][2]) if rows[i][2] else None)
+            for i in top
+        }
+        return hits, chapters
+
+    def semantic_retrieve_range(self, query: str, start: date, end: date, top_k: int = 5,
+                                query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        """Retrieve semantically but restricted to chapters in [start, end]"""
+        # only the query gets encoded, the chapters' vectors are stored
+        query_emb = self._encode(query) if query_emb is None else query_emb
+        hits, chapters = self._filtered_search(query_emb, *_day_clause(start, end, None), top_k)
+        return [{"chapter": chapters[chapter_id], "score": score} for chapter_id, score in hits]
+
+    def semantic_retrieve_days(self, query: str, days: Sequence[date], top_k: int = 5,
+                               query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        """Retrieve semantically among the chapters of the given days"""
+        if not days:
+            return []
+        query_emb = self._encode(query) if query_emb is None else query_emb
+        hits, chapters = self._filtered_search(query_emb, *_day_clause(None, None, days), top_k)
+        return [{"chapter": chapters[chapter_id], "score": score} for chapter_id, score in hits]
+
+    def lexical_search(self, query: str, k: int, start: Optional[date] = None,
+                       end: Optional[date] = None, days: Optional[Sequence[date]] = None) -> List[tuple]:
+        """BM25 full-text search: (chapter_id, score) pairs, best first, optionally within [start, end] or `days`"""
+        match = fts_query(query)
+        if not self.lexical or match is None or (days is not None and not days):
+            return []
+        # bm25() is lower-is-better, negated so scores compare like the dense ones
+        if start is None and end is None and days is None:
+            rows = self.db.query('''
+                SELECT rowid, -bm25(chapters_fts) FROM chapters_fts
+                WHERE chapters_fts MATCH ?
+                ORDER BY bm25(chapters_fts) LIMIT ?
+            ''', (match, k))
+        else:
+            where, params = _day_clause(start, end, days)
+            rows = self.db.query(f'''
+                SELECT chapters_fts.rowid, -bm25(chapters_fts) FROM chapters_fts
+                JOIN chapters ON chapters.id = chapters_fts.rowid
+                WHERE chapters_fts MATCH ? AND {where}
+                ORDER BY bm25(chapters_fts) LIMIT ?
+            ''', (match, *params, k))
+        return [(r[0], r[1]) for r in rows]
+
+    def hybrid_search(self, query: str, top_k: int = 5, start: Optional[date] = None, end: Optional[date] = None,
+                      days: Optional[Sequence[date]] = None, candidates: int = 50, rrf_k: int = 60,
+                      query_emb: Optional[np.ndarray] = None) -> List[dict]:
+        """Dense and BM25 candidates merged by reciprocal-rank fusion.
+
+        The lexical side catches exact tokens (names, ids, error codes) that
+        fall outside the dense top-k. Each side contributes its best
+        `candidates`; a chapter scores sum(1 / (rrf_k + rank)) over the sides
+        that found it. With `start` and/or `end` (`end` defaults to `start`)
+        or `days` both sides only search chapters of those days. `query_emb`
+        skips encoding `query`.
+        """
+        if days is not None and not days:
             return []
+        query_emb = self._encode(query) if query_emb is None else query_emb
+        if start is None and end is None and days is None:
+            dense, chapters = self.index.search(query_emb, candidates), {}
+        else:
+            dense, chapters = self._filtered_search(query_emb, *_day_clause(start, end, days), candidates)
+        lexical = self.lexical_search(query, candidates, start, end, days)
 
-        # 2. Build temporary embeddings + FAISS index for this subset
-        memories = [r[1] for r in rows]
-        ids = [r[0] for r in rows]
-        emb = self.model.encode(memories, convert_to_numpy=True, show_progress_bar=False)
-        emb = emb / np.linalg.norm(emb, axis=1, keepdims=True)
-
-        sub_index = faiss.IndexFlatIP(self.embedding_dim)
-        sub_index.add(emb)
-
-        # 3. Query
-        query_emb = self.model.encode(query, convert_to_numpy=True)
-        query_emb = query_emb / np.linalg.norm(query_emb)
-        D, I = sub_index.search(np.expand_dims(query_emb, axis=0), min(top_k, len(ids)))
-
-        # 4. Collect results
-        results = []
-        for idx, score in zip(I[0], D[0]):
-            row = rows[idx]
-            results.append({
-                "chapter": Chapter(
-                    day=date.fromisoformat(row[3]),
-                    memory=row[1],
-                    tags=json.loads(row[2]) if row[2] else None
-                ),
-                "score": float(score)
-            })
-
-        return results
+        fused: Dict[int, float] = defaultdict(float)
+        for hits in (dense, lexical):
+            for rank, (chapter_id, _) in enumerate(hits, start=1):
+                fused[chapter_id] += 1.0 / (rrf_k + rank)
+        top = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        chapters.update(self._fetch_chapters([chapter_id for chapter_id in top if chapter_id not in chapters]))
+        return [{"chapter": chapters[chapter_id], "score": fused[chapter_id]} for chapter_id in top if chapter_id in chapters]
     
     def semantic_retrieve_day(self, query: str, day: date, top_k: int = 5) -> List[dict]:
         """Semantic retrieve but restricted to a single day"""
         return self.semantic_retrieve_range(query, start=day, end=day, top_k=top_k)
 
+    def close(self):
+        """Checkpoint the index and close the database"""
+        if self._index is not None:
+            self._index.close()
+        self.db.close()
@@ -1,59 +1,132 @@
-import sqlite3
+import threading
 from datetime import date
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
+import numpy as np
+
+from src.core.embedding_interface import Embedder
 from src.core.memory_interface import DailyMemory
+from src.storage.sqlite_db import SQLiteDB
 
 
 class DailyMemoryStorage:
-    def __init__(self, db_path: str = "memory.db"):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+    """Daily memories in SQLite, one row per day.
+
+    With an `embedder` (the chapter store's, so both live in one vector
+    space) each memory is embedded when saved and `semantic_days` ranks days
+    by similarity to a query. There is about one vector per day, so they are
+    kept in memory as one matrix and scored exactly.
+    """
+
+    def __init__(self, db_path: str = "memory.db", embedder: Optional[Embedder] = None):
+        # per-thread connections: rollup workers write while the conversation reads
+        self.db = SQLiteDB(db_path)
+        self.embedder = embedder
         self._init_table()
+        # (days, vectors) of the embedded memories, loaded on first search
+        self._vectors: Optional[Tuple[List[date], np.ndarray]] = None
+        self._vectors_lock = threading.Lock()
 
     def _init_table(self):
-        cur = self.conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS daily_memories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day DATE UNIQUE,
-                memory TEXT NOT NULL,
-                tags TEXT
-            )
-        """)
-        self.conn.commit()
+        with self.db.transaction() as conn:
+            # day is UNIQUE, which already gives lookups and ranges on it an index
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_memories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    day DATE UNIQUE,
+                    memory TEXT NOT NULL,
+                    tags TEXT
+                )
+            """)
+            # databases from before daily memories were embedded lack the column
+            if "embedding" not in {r[1] for r in conn.execute("PRAGMA table_info(daily_memories)")}:
+                conn.execute("ALTER TABLE daily_memories ADD COLUMN embedding BLOB")
 
     def save(self, daily: DailyMemory):
         """Insert or replace a daily memory."""
         tags_str = ",".join(daily.tags) if daily.tags else None
-        cur = self.conn.cursor()
-        cur.execute("""
-            INSERT INTO daily_memories (day, memory, tags)
-            VALUES (?, ?, ?)
+        embedding = self.embedder.encode([daily.memory])[0].tobytes() if self.embedder else None
+        self.db.execute("""
+            INSERT INTO daily_memories (day, memory, tags, embedding)
+            VALUES (?, ?, ?, ?)
             ON CONFLICT(day) DO UPDATE SET
                 memory = excluded.memory,
-                tags = excluded.tags
-        """, (daily.day.isoformat(), daily.memory, tags_str))
-        self.conn.commit()
+                tags = excluded.tags,
+                embedding = excluded.embedding
+        """, (daily.day.isoformat(), daily.memory, tags_str, embedding))
+        with self._vectors_lock:
+            self._vectors = None
 
     def get_by_date(self, day: date) -> Optional[DailyMemory]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT day, memory, tags FROM daily_memories WHERE day = ?", (day.isoformat(),))
-        row = cur.fetchone()
+        row = self.db.execute("SELECT day, memory, tags FROM daily_memories WHERE day = ?", (day.isoformat(),)).fetchone()
         if row:
             tags = row[2].split(",") if row[2] else None
             return DailyMemory(day=date.fromisoformat(row[0]), memory=row[1], tags=tags)
         return None
 
+    def days(self) -> List[date]:
+        """Days that have a daily memory"""
+        return [date.fromisoformat(r[0]) for r in self.db.query("SELECT day FROM daily_memories")]
+
     def get_range(self, start_day: date, end_day: date) -> List[DailyMemory]:
-        cur = self.conn.cursor()
-        cur.execute("""
+        rows = self.db.query("""
             SELECT day, memory, tags FROM daily_memories
             WHERE day BETWEEN ? AND ?
             ORDER BY day ASC
         """, (start_day.isoformat(), end_day.isoformat()))
-        rows = cur.fetchall()
         result = []
         for row in rows:
             tags = row[2].split(",") if row[2] else None
             result.append(DailyMemory(day=date.fromisoformat(row[0]), memory=row[1], tags=tags))
         return result
+
+    def _load_vectors(self) -> Tuple[List[date], np.ndarray]:
+        """All days with their vectors, embedding the ones saved without (or by another model) first"""
+        dim = self.embedder.dim
+        rows = self.db.query("SELECT id, memory, embedding, day FROM daily_memories ORDER BY day")
+        stale = [i for i, r in enumerate(rows) if r[2] is None or len(r[2]) != dim * 4]
+        if stale:
+            emb = self.embedder.encode([rows[i][1] for i in stale])
+            rows = list(rows)
+            for i, e in zip(stale, emb):
+                rows[i] = rows[i][:2] + (e.tobytes(),) + rows[i][3:]
+            with self.db.transaction() as conn:
+                conn.executemany("UPDATE daily_memories SET embedding = ? WHERE id = ?",
+                                 [(rows[i][2], rows[i][0]) for i in stale])
+        days = [date.fromisoformat(r[3]) for r in rows]
+        if not rows:
+            return days, np.empty((0, dim), dtype=np.float32)
+        return days, np.vstack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+
+    def semantic_days(self, query: str, top_k: int = 3, start: Optional[date] = None,
+                      end: Optional[date] = None) -> List[dict]:
+        """Days whose memory is most similar to `query`, as {"daily", "score"} hits, best first.
+
+        `start`/`end` restrict the candidate days. Empty without an embedder.
+        """
+        if self.embedder is None:
+            return []
+        with self._vectors_lock:
+            if self._vectors is None:
+                self._vectors = self._load_vectors()
+            days, vectors = self._vectors
+        if start is not None or end is not None:
+            keep = [i for i, d in enumerate(days) if (start is None or d >= start) and (end is None or d <= end)]
+            days, vectors = [days[i] for i in keep], vectors[keep]
+        if not days:
+            return []
+        scores = vectors @ self.embedder.encode([query])[0]
+        k = min(top_k, len(days))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        best = {days[i]: float(scores[i]) for i in top}
+        # one query for the texts of the chosen days
+        placeholders = ",".join("?" * len(best))
+        rows = self.db.query(f"SELECT day, memory, tags FROM daily_memories WHERE day IN ({placeholders})",
+                             [d.isoformat() for d in best])
+        hits = [{"daily": DailyMemory(day=date.fromisoformat(r[0]), memory=r[1], tags=r[2].split(",") if r[2] else None),
+                 "score": best[date.fromisoformat(r[0])]} for r in rows]
+        return sorted(hits, key=lambda h: h["score"], reverse=True)
+
+    def close(self):
+        self.db.close()
@@ -4,38 +4,112 @@ from typing import Optional, Deque, List
 
 from src.core.memory_interface import Turn, SnapShot
 import os
+import threading
 
 
 class RecentStorage:
-    def __init__(self, file_path: str = "recent.json"):
+    """Recent turns + rolling snapshot, kept in memory and persisted as a journal.
+
+    `file_path` holds the last compacted state ({"turns", "snapshot", "seq"}).
+    Every change after it is appended as one JSON line to `<file_path>.journal`
+    and replayed on load, so a save never rewrites the state file. The journal
+    is fsynced every `fsync_every` records and compacted into `file_path`
+    (atomic replace) once it holds `compact_every` records.
+    """
+
+    def __init__(self, file_path: str = "recent.json", fsync_every: int = 8, compact_every: int = 200):
         self.file_path = file_path
-        # initialize json file if not exists
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump({"turns": [], "snapshot": None}, f, indent=2)
+        self.journal_path = file_path + ".journal"
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        # turns are saved from the caller, snapshots from the memory worker
+        self._lock = threading.Lock()
+        self._turns: Deque[dict] = deque(maxlen=5)  # keep last 5
+        self._snapshot: Optional[dict] = None
+        self._seq = 0          # sequence number of the last applied record
+        self._journaled = 0    # records in the journal since the last compaction
+        self._unsynced = 0
+        torn = self._load()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        # initialize state file if not exists; a torn journal tail must not prefix new records
+        if torn or not os.path.exists(self.file_path):
+            self._compact()
+
+    def _load(self) -> bool:
+        """Load state + replay the journal; True if the journal ended in a torn record."""
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                # torn write from the old in-place writer; the journal still has recent records
+                data = {}
+            self._turns.extend(data.get("turns") or [])
+            self._snapshot = data.get("snapshot")
+            self._seq = data.get("seq", 0)
+
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    return True  # torn tail from a crash mid-append
+                self._journaled += 1
+                # records already folded into the state file by a compaction
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply(record)
+        return False
 
-    def _read_file(self) -> dict:
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    def _apply(self, record: dict):
+        if "turn" in record:
+            self._turns.append(record["turn"])
+        if "snapshot" in record:
+            self._snapshot = record["snapshot"]
+        self._seq = record["seq"]
 
-    def _write_file(self, data: dict):
-        with open(self.file_path, "w", encoding="utf-8") as f:
+    def _append(self, record: dict):
+        with self._lock:
+            record["seq"] = self._seq + 1
+            self._apply(record)
+            self._journal.write(json.dumps(record) + "\n")
+            self._journal.flush()
+            self._journaled += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+            if self._journaled >= self.compact_every:
+                self._compact()
+
+    def _sync(self):
+        os.fsync(self._journal.fileno())
+        self._unsynced = 0
+
+    def _compact(self):
+        """Write the in-memory state atomically, then start an empty journal."""
+        data = {"turns": list(self._turns), "snapshot": self._snapshot, "seq": self._seq}
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.file_path)
+        # a crash before the truncate only leaves records the seq check skips
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self._journaled = 0
+        self._unsynced = 0
 
     def save_turn(self, turn: Turn):
         """Save a turn, keep only last 5 turns."""
-        data = self._read_file()
-        turns = data.get("turns", [])
-        turns.append(turn.to_dict())
-        if len(turns) > 5:
-            turns = turns[-5:]  # keep last 5
-        data["turns"] = turns
-        self._write_file(data)
+        self._append({"turn": turn.to_dict()})
 
     def load_turns(self) -> Deque[Turn]:
         """Load all turns as deque (oldest left, newest right)."""
-        data = self._read_file()
-        turns_data = data.get("turns", [])
+        with self._lock:
+            turns_data = list(self._turns)
         if not turns_data:
             return deque(maxlen=6)   # empty deque with maxlen=6
         turns = [Turn.from_dict(t) for t in turns_data]
@@ -44,14 +118,18 @@ class RecentStorage:
 
     def save_rolling_snapshot(self, snapshot: SnapShot):
         """Save rolling snapshot, overwrite if exists."""
-        data = self._read_file()
-        data["snapshot"] = snapshot.to_dict()
-        self._write_file(data)
+        self._append({"snapshot": snapshot.to_dict()})
 
     def load_snapshot(self) -> Optional[SnapShot]:
         """Load current rolling snapshot if available."""
-        data = self._read_file()
-        snap = data.get("snapshot")
+        with self._lock:
+            snap = self._snapshot
         if snap:
             return SnapShot.from_dict(snap)
         return None
+
+    def close(self):
+        """Fsync and compact the journal, then close it."""
+        with self._lock:
+            self._compact()
+            self._journal.close()
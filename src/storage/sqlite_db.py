@@ -0,0 +1,96 @@
+from __future__ import annotations
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Sequence
+
+
+class _Holder:
+    """Weak-referenceable marker kept in a thread's local storage"""
+
+
+def _release(conns: List[sqlite3.Connection], lock: threading.Lock, conn: sqlite3.Connection) -> None:
+    # no-op when close() got to the connection first
+    with lock:
+        if conn not in conns:
+            return
+        conns.remove(conn)
+    conn.close()
+
+
+class SQLiteDB:
+    """One SQLite file used from many threads.
+
+    Each thread gets its own connection (opened on first use), so readers
+    never share a cursor with a writer. The database runs in WAL mode:
+    readers don't block the writer or each other, and commits only fsync
+    the log (synchronous=NORMAL). Statements autocommit; group multi-statement
+    writes with `transaction()`. Writers wait up to `busy_timeout` seconds
+    for the write lock instead of failing.
+
+    A thread's connection is closed when the thread ends, so short-lived
+    threads (index checkpoints, retrievals) don't leave connections open.
+
+    Not for ':memory:' databases, each connection would see its own.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # persistent in the file, set once
+        self.conn.execute('PRAGMA journal_mode=WAL')
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: no implicit transactions, see transaction()
+            # check_same_thread=False only so close() can close every thread's connection
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            # the thread-local dies with the thread; its holder takes the connection along
+            self._local.holder = holder = _Holder()
+            weakref.finalize(holder, _release, self._conns, self._lock, conn)
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, params)
+
+    def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        return self.conn.executemany(sql, rows)
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        return self.conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed statements as one write transaction (nested calls join the outer one)"""
+        conn = self.conn
+        if conn.in_transaction:
+            yield conn
+            return
+        # IMMEDIATE takes the write lock up front, so the transaction can't fail halfway on a busy database
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def close(self) -> None:
+        with self._lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
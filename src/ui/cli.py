@@ -1,21 +1,18 @@
 from __future__ import annotations
+import time
+STARTUP_T0 = time.perf_counter()
 import argparse
+import os
 import sys
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
 
 
 from src.config import AppConfig, LLMConfig
-from src.llms.gemini_llm import GeminiLLM
-from src.llms.ollama_llm import OllamaLLM
-from src.memory.agent_memory import AgentMemory
+from src.llms.cached_llm import CachedLLM
+from src.engine.context_builder import ContextBuilder, approx_tokens, hf_tokenizer
 from src.engine.conversation_engine import ConversationEngine
-from src.storage.chapter_storage import ChapterStorage
-from src.storage.daily_storage import DailyMemoryStorage
-from src.storage.json_storage import RecentStorage
-from src.memory.aggregator import Aggregator
-from src.memory.metacognition import MetaCognition
+from src.embeddings.factory import make_embedder
+from src.memory.tenants import USER_ID, open_partition
+from src.utils.startup import StartupTimer
 
 PROVIDER_CHOICES = ("gemini", "ollama")
 
@@ -23,12 +20,15 @@ PROVIDER_CHOICES = ("gemini", "ollama")
 
 
 def make_llm(cfg: LLMConfig):
+    # provider clients (and their SDKs) are imported only for the chosen provider
     if cfg.provider == "gemini":
+        from src.llms.gemini_llm import GeminiLLM
         return GeminiLLM(model=cfg.model or "gemini-1.5-pro", temperature=cfg.temperature)
     if cfg.provider == "ollama":
         base = cfg.base_url or "http://localhost:11434"
         model = cfg.model or "llama3"
-        return OllamaLLM(base_url=base, model=model, temperature=cfg.temperature)
+        from src.llms.ollama_llm import OllamaLLM
+        return OllamaLLM(base_url=base, model=model, keep_alive=cfg.keep_alive, chat=cfg.chat, temperature=cfg.temperature)
     raise ValueError(f"Unknown provider: {cfg.provider}")
 
 
@@ -39,22 +39,69 @@ def main(argv=None):
     parser.add_argument("--provider", choices=PROVIDER_CHOICES, default="ollama")
     parser.add_argument("--model", default="llama3", help="Model name/tag for provider")
     parser.add_argument("--base-url", default="http://localhost:11434", help="Ollama base URL (if provider=ollama)")
+    parser.add_argument("--keep-alive", default="10m", help="How long Ollama keeps the model loaded between calls (e.g. 10m; seconds, -1 = forever)")
+    parser.add_argument("--ollama-chat", action="store_true", help="Talk to Ollama's /api/chat endpoint instead of /api/generate")
     parser.add_argument("--temp", type=float, default=0.2)
     parser.add_argument("--sum-every", type=int, default=6, help="Summarize every N turns")
+    parser.add_argument("--no-stream", action="store_true", help="Print the reply only once it is complete")
+    parser.add_argument("--show-prompt", action="store_true", help="Print the full prompt sent for every reply")
+    parser.add_argument("--sum-batch", type=int, default=4,
+                        help="Fold N evicted turns into the rolling summary per LLM call (the cached system prompt is reused for N turns)")
+    parser.add_argument("--index-codec", choices=("flat", "fp16", "sq8", "pq"), default="flat", help="Vector codec for the chapter index")
+    parser.add_argument("--index-mmap", action="store_true", help="Open the chapter index memory-mapped")
+    parser.add_argument("--index-ann", choices=("hnsw", "ivf", "none"), default="hnsw", help="Approximate index used past --ann-threshold chapters")
+    parser.add_argument("--ann-threshold", type=int, default=50_000, help="Chapter count at which the index switches to --index-ann")
+    parser.add_argument("--report-recall", action="store_true", help="Print the chapter index's recall@10 against exact search at startup")
+    parser.add_argument("--no-fast-router", action="store_true", help="Always ask the LLM for the retrieval strategy")
+    parser.add_argument("--router-shadow-rate", type=float, default=0.0,
+                        help="Share of fast-router decisions also sent to the LLM to measure agreement (shown on exit)")
+    parser.add_argument("--no-lexical", action="store_true", help="Search chapters by embedding only, without the full-text (BM25) index")
+    parser.add_argument("--no-speculate", action="store_true", help="Don't start retrievals before the retrieval decision is made")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Don't cache summarization/rollup/metacognition LLM calls")
+    parser.add_argument("--llm-cache-ttl", type=float, default=None, help="Seconds a cached LLM response stays valid")
+    parser.add_argument("--context-budget", type=int, default=3000, help="Token budget of the reply prompt")
+    parser.add_argument("--tokenizer", default=None, help="Hugging Face tokenizer used to count prompt tokens (default: ~4 chars/token)")
+    parser.add_argument("--embedder", default="all-MiniLM-L6-v2",
+                        help="sentence-transformers model name, or onnx:<dir> for an int8 ONNX export (no torch)")
+    parser.add_argument("--embedding-socket", default=None,
+                        help="Encode through the shared embedding service on this Unix socket (falls back to --embedder in-process)")
+    parser.add_argument("--no-warmup", action="store_true", help="Load the embedding model on first use instead of in the background at startup")
+    parser.add_argument("--startup-report", action="store_true", help="Print startup stage timings and which heavy modules were imported")
+    parser.add_argument("--data-dir", default=".", help="Where memory files live")
+    parser.add_argument("--user", default=None, help="Keep this user's memory in its own partition under --data-dir")
     args = parser.parse_args(argv)
+    startup = StartupTimer(STARTUP_T0)
+    startup.mark("imports")
+    if args.user is not None and not USER_ID.match(args.user):
+        parser.error("--user must match [A-Za-z0-9_-]{1,64}")
 
 
-    app_cfg = AppConfig(llm=LLMConfig(provider=args.provider, model=args.model, base_url=args.base_url, temperature=args.temp), summarize_every=args.sum_every)
+    app_cfg = AppConfig(llm=LLMConfig(provider=args.provider, model=args.model, base_url=args.base_url, keep_alive=args.keep_alive, chat=args.ollama_chat, temperature=args.temp), summarize_every=args.sum_every, summarize_batch=args.sum_batch, context_budget=args.context_budget)
 
 
     llm = make_llm(app_cfg.llm)
-    chapter_store = ChapterStorage("chapters.db")
-    daily_store = DailyMemoryStorage("memory.db")
-    recent_store = RecentStorage("recent.json")
-    aggr = Aggregator(llm, chapter_store, daily_store)
-    memory = AgentMemory(llm=llm,chapter_store=chapter_store,recent_store=recent_store, aggr=aggr)
-    meta = MetaCognition(llm=llm,chapter_store=chapter_store,daily_store=daily_store)
-    engine = ConversationEngine(llm=llm, memory=memory,meta=meta, aggr=aggr)
+    chapter_options = dict(index_codec=args.index_codec, index_mmap=args.index_mmap,
+                           index_ann=None if args.index_ann == "none" else args.index_ann,
+                           ann_threshold=args.ann_threshold, warmup=not args.no_warmup)
+    directory = os.path.join(args.data_dir, args.user) if args.user else args.data_dir
+    os.makedirs(args.data_dir, exist_ok=True)
+    # internal calls are deterministic enough to cache across restarts; replies are not cached
+    internal_llm = CachedLLM(llm, os.path.join(args.data_dir, "llm_cache.db"), ttl=args.llm_cache_ttl,
+                             bypass=args.no_llm_cache)
+    embedder = make_embedder(args.embedder, args.embedding_socket)
+    part = open_partition(directory, internal_llm, user_id=args.user or "", embedder=embedder, chapter_options=chapter_options,
+                          memory_options=dict(summarize_batch=app_cfg.summarize_batch),
+                          fast_router=not args.no_fast_router, router_shadow_rate=args.router_shadow_rate,
+                          lexical=not args.no_lexical)
+    engine = ConversationEngine(llm=llm, memory=part.memory, meta=part.meta, aggr=part.aggr,
+                                speculative=not args.no_speculate, show_prompt=args.show_prompt,
+                                context_builder=ContextBuilder(app_cfg.context_budget,
+                                                               hf_tokenizer(args.tokenizer) if args.tokenizer else approx_tokens))
+    startup.mark("ready")
+    if args.startup_report:
+        print(f"[startup] {startup.report()}")
+    if args.report_recall:
+        print(f"[index] {part.chapter_store.index.recall_at_k(k=10)}")
 
 
     print("\n>>> Memory‑First LLM (CLI). Type 'exit' to quit.\n")
@@ -65,15 +112,43 @@ def main(argv=None):
             print() ; break
         if user.lower() in {"exit", ":q", "quit"}:
             break
-        reply = engine.stepv2(user)
+        from rich.console import Console
+        from rich.live import Live
+        from rich.markdown import Markdown
+        from rich.panel import Panel
         console = Console()
-        md = Markdown(reply)
-        console.print(Panel(md, title="AI", expand=False))
+        if args.no_stream:
+            reply = engine.stepv2(user)
+            md = Markdown(reply)
+            console.print(Panel(md, title="AI", expand=False))
+        else:
+            reply = ""
+            # render the reply live as chunks arrive
+            with Live(Panel(Markdown(reply), title="AI", expand=False), console=console, refresh_per_second=12) as live:
+                for chunk in engine.stream_stepv2(user):
+                    reply += chunk
+                    live.update(Panel(Markdown(reply), title="AI", expand=False))
         print(f"AI: {reply}\n")
         # Show debug summary every turn for transparency
         # if memory.summary():
         #     print("[Memory Summary]\n" + memory.summary() + "\n")
 
+    if engine.llm_stats:
+        from src.llms.ollama_llm import prompt_eval_summary
+        print(f"[prompt eval] {prompt_eval_summary(engine.llm_stats)}")
+    if not args.no_llm_cache:
+        print(f"[llm cache] {internal_llm.stats()}")
+    if part.meta.router:
+        print(f"[router] {part.meta.router.report()}")
+    print(f"[rollups] {part.rollups.metrics()}")
+    load_seconds = getattr(part.chapter_store.embedder, "load_seconds", None)
+    if args.startup_report and load_seconds is not None:
+        print(f"[startup] embedding model loaded in {load_seconds:.2f}s")
+    engine.close()
+    # finish queued summaries/chapters, then fold pending chapter vectors into the index checkpoint
+    part.close()
+    internal_llm.close()
+
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
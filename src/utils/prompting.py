@@ -76,7 +76,7 @@ No explanations, no markdown, no text outside JSON.
 Rules:
 - Always output in this schema:
   {
-    "strategy": "none" | "semantic" | "day" | "hybrid",
+    "strategy": "none" | "semantic" | "day" | "hybrid" | "period",
     "params": { ... }
   }
 
@@ -102,10 +102,16 @@ Strategies:
      "query": "<semantic query>"
    }
 
+5. "period" → Find the days that best match the query, then search their chapters.
+   params = {
+     "query": "<semantic query including the time hint>"
+   }
+
 Guidelines:
 - If the user explicitly asks about a specific date or time range → use "day".
 - If the user asks conceptually / thematically → use "semantic".
 - If the user specifies both timeframe and topic → use "hybrid".
+- If the user refers to a time only vaguely ("that trip last spring", "a while ago") → use "period".
 - If irrelevant or chit-chat → "none".
 - Dates must always be ISO format (YYYY-MM-DD).
 - Keep JSON minimal, deterministic, and machine-parseable.
@@ -0,0 +1,28 @@
+from __future__ import annotations
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# dependencies that should only be imported once something needs them
+HEAVY_MODULES = ("torch", "sentence_transformers", "faiss", "google.generativeai", "rich", "dateparser", "transformers")
+
+
+class StartupTimer:
+    """Wall-clock time to each startup stage, plus which heavy modules got imported by then.
+
+    Run the CLI with `--startup-report` (or `python -X importtime`) to catch
+    startup regressions.
+    """
+
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.stages: List[Tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        self.stages.append((stage, time.perf_counter() - self.t0))
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "stages_ms": {stage: round(t * 1000, 1) for stage, t in self.stages},
+            "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+        }